@@ -3,15 +3,27 @@ AI-Powered Smart Public Transport Optimization System for Chennai
 Main FastAPI Application
 """
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime
 from typing import Optional, List
+from functools import lru_cache
+from bisect import bisect_right
+from itertools import islice
+from contextlib import asynccontextmanager
+from anyio import to_thread
+import asyncio
 import uvicorn
+import orjson
+import numpy as np
 import pandas as pd
 import os
+import re
 import sys
+import time
 
 # Add current and parent directory to sys.path to ensure local modules are found
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -23,22 +35,49 @@ from core.route_engine import RouteEngine
 from core.ml_engine import MLEngine
 from core.eta_predictor import BusETAPredictor
 
+# Sync (def) endpoints run CPU-bound route/ML work in the threadpool,
+# raise its size from AnyIO's default of 40 threads
+THREADPOOL_SIZE = 100
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    yield
+
 app = FastAPI(
     title="Chennai MTC Smart Transport API",
     description="AI-powered bus route optimization system",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS middleware for frontend
-ORIGINS = os.getenv("ALLOWED_ORIGINS", "*").split(",")
+ORIGINS = [origin.strip() for origin in os.getenv("ALLOWED_ORIGINS", "*").split(",") if origin.strip()]
+if "*" in ORIGINS:
+    # A wildcard anywhere in the list allows every origin; browsers reject
+    # credentialed requests against a wildcard origin anyway
+    cors_options = {"allow_origins": ["*"], "allow_credentials": False}
+else:
+    # One precompiled regex match per request instead of a list scan
+    cors_options = {
+        "allow_origins": [],
+        "allow_origin_regex": "|".join(map(re.escape, ORIGINS)),
+        "allow_credentials": True,
+    }
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=ORIGINS,
-    allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    **cors_options
 )
 
+# Compress large JSON payloads (stop lists, destinations, live positions)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+# Browser/CDN caching for payloads that only change on data reload
+STATIC_CACHE_CONTROL = "public, max-age=300"
+
 # Initialize components
 data_loader = DataLoader()
 route_engine = RouteEngine(data_loader)
@@ -85,7 +124,9 @@ async def root():
         "endpoints": ["/search-route", "/predict-time", "/get-stops", "/get-route-map"]
     }
 
-@app.get("/get-stops", response_model=List[StopResponse])
+# Schema documented via `responses` only: re-validating trusted DataLoader rows
+# on every call costs throughput (and rejected rows with non-string stop ids)
+@app.get("/get-stops", responses={200: {"model": List[StopResponse]}})
 async def get_stops(query: str = Query(None, description="Search query for stop name")):
     """Get all stops or search stops by name"""
     try:
@@ -100,67 +141,86 @@ async def get_stop_suggestions(query: str = Query(..., min_length=1), limit: int
     suggestions = data_loader.get_stop_suggestions(query, limit)
     return {"suggestions": suggestions}
 
-@app.get("/get-reachable-stops")
-async def get_reachable_stops(from_stop: str, limit: int = 50):
+@lru_cache(maxsize=4096)
+def _compute_reachable_stops(from_lower: str, cache_version: int) -> tuple:
     """
-    Get all stops reachable from a given stop
-    Only returns stops that have direct bus routes from the source
+    Reachable stops for a normalized source stop name
+    Cached per data version, returns (routes, reachable_stops) tuples
     """
-    reachable = []
-    seen_stops = set()
+    reachable_by_stop = {}  # stop_key -> entry
     
     # Get all routes passing through this stop
-    routes = data_loader.get_routes_for_stop(from_stop)
+    routes = data_loader.get_routes_for_stop(from_lower)
+    related_names = None
     
     for route in routes:
-        stops = data_loader.get_route_stops(route)
+        stops = data_loader.get_route_stops_view(route)
         
-        # Find the source stop's sequence (fuzzy match)
-        source_seq = None
-        from_lower = from_stop.lower().strip()
-        for stop in stops:
-            sn = stop['stop_name'].lower()
-            if sn == from_lower or from_lower in sn or sn in from_lower:
-                source_seq = stop['sequence']
-                break
+        # Find the source stop's sequence (exact index hit, else fuzzy match)
+        source_seq = data_loader.route_stop_seq[route].get(from_lower)
+        if source_seq is None:
+            if related_names is None:
+                related_names = data_loader.stop_matcher.related(from_lower)
+            for stop in stops:
+                if stop['stop_name_lower'] in related_names:
+                    source_seq = stop['sequence']
+                    break
         
         if source_seq is None:
             continue
         
-        # Get stops AFTER source (destinations)
-        for stop in stops:
+        # Get stops AFTER source (destinations), skipping ahead via bisect
+        start = bisect_right(data_loader.route_sequences[route], source_seq)
+        for stop in islice(stops, start, None):
             if stop['sequence'] > source_seq:
-                stop_key = stop['stop_name'].lower()
-                if stop_key not in seen_stops:
-                    seen_stops.add(stop_key)
-                    reachable.append({
+                stop_key = stop['stop_name_lower']
+                stops_away = stop['sequence'] - source_seq
+                entry = reachable_by_stop.get(stop_key)
+                if entry is None:
+                    reachable_by_stop[stop_key] = {
                         'stop_id': stop['stop_id'],
                         'stop_name': stop['stop_name'],
                         'latitude': stop['latitude'],
                         'longitude': stop['longitude'],
-                        'routes': [route],
-                        'stops_away': stop['sequence'] - source_seq
-                    })
+                        'routes': {route},
+                        'stops_away': stops_away
+                    }
                 else:
                     # Add route to existing stop
-                    for r in reachable:
-                        if r['stop_name'].lower() == stop_key:
-                            if route not in r['routes']:
-                                r['routes'].append(route)
-                            break
+                    entry['routes'].add(route)
+                    entry['stops_away'] = min(entry['stops_away'], stops_away)
+    
+    # Routes are accumulated as sets, emit them as sorted lists
+    for entry in reachable_by_stop.values():
+        entry['routes'] = sorted(entry['routes'])
     
     # Sort by number of routes (more routes = more popular destination)
-    reachable.sort(key=lambda x: (-len(x['routes']), x['stops_away']))
+    reachable = sorted(
+        reachable_by_stop.values(),
+        key=lambda x: (-len(x['routes']), x['stops_away'])
+    )
+    
+    return tuple(routes), tuple(reachable)
+
+@app.get("/get-reachable-stops")
+def get_reachable_stops(from_stop: str, limit: int = 50):
+    """
+    Get all stops reachable from a given stop
+    Only returns stops that have direct bus routes from the source
+    """
+    routes, reachable = _compute_reachable_stops(
+        from_stop.lower().strip(), data_loader.cache_version
+    )
     
     return {
         "from_stop": from_stop,
         "total_reachable": len(reachable),
         "routes_from_stop": list(routes),
-        "reachable_stops": reachable[:limit]
+        "reachable_stops": list(reachable[:limit])
     }
 
 @app.post("/search-route")
-async def search_route(request: RouteRequest):
+def search_route(request: RouteRequest):
     """Search for routes between source and destination"""
     try:
         routes = route_engine.find_routes(
@@ -175,21 +235,20 @@ async def search_route(request: RouteRequest):
                 detail="No routes found between the specified stops"
             )
         
-        # Add ML predictions to routes
-        enriched_routes = []
-        for route in routes:
-            prediction = ml_engine.predict_travel_time(
-                number_of_stops=route['stops_between'],
-                total_distance_km=route['total_distance_km'],
-                time_of_day=request.time_of_day,
-                route_length=route['total_distance_km']
-            )
+        # Add ML predictions to routes (one batched model call)
+        X = np.array([
+            [route['stops_between'], route['total_distance_km'],
+             request.time_of_day, route['total_distance_km']]
+            for route in routes
+        ], dtype=np.float64)
+        predictions = ml_engine.predict_travel_time_batch(X)
+        
+        for route, prediction in zip(routes, predictions):
             route['predicted_time_minutes'] = prediction['predicted_time']
             route['delay_probability'] = prediction['delay_probability']
-            enriched_routes.append(route)
         
         # Rank routes
-        ranked_routes = route_engine.rank_routes(enriched_routes)
+        ranked_routes = route_engine.rank_routes(routes)
         return ranked_routes
         
     except HTTPException:
@@ -263,21 +322,21 @@ async def get_stats():
     }
 
 @app.get("/list-all-stops")
-async def list_all_stops():
+async def list_all_stops(response: Response):
     """List all unique stop names in the system"""
-    stops = list(data_loader.stop_to_routes.keys())
+    response.headers["Cache-Control"] = STATIC_CACHE_CONTROL
     return {
-        "total": len(stops),
-        "stops": sorted(stops)
+        "total": len(data_loader.sorted_stop_keys),
+        "stops": data_loader.sorted_stop_keys
     }
 
 @app.get("/list-all-routes")
-async def list_all_routes():
+async def list_all_routes(response: Response):
     """List all route numbers in the system"""
-    routes = list(data_loader.route_stops_index.keys())
+    response.headers["Cache-Control"] = STATIC_CACHE_CONTROL
     return {
-        "total": len(routes),
-        "routes": sorted(routes)
+        "total": len(data_loader.sorted_routes),
+        "routes": data_loader.sorted_routes
     }
 
 # ============== REAL-TIME BUS ETA ENDPOINTS ==============
@@ -287,6 +346,9 @@ class ETARequest(BaseModel):
     to_stop: str
     route_number: Optional[str] = None
 
+# Stays on the event loop: the movement tick and ticket updates rewrite the
+# predictor's position columns in place there, so ETA scoring never sees a
+# half-applied tick
 @app.post("/get-bus-eta")
 async def get_bus_eta(request: ETARequest):
     """
@@ -302,15 +364,27 @@ async def get_bus_eta(request: ETARequest):
             data_loader
         )
     else:
-        # Find routes and get ETA for all
-        routes = route_engine.find_routes(request.from_stop, request.to_stop)
-        if not routes:
-            return {"error": "No routes found", "incoming_buses": []}
+        # Direct routes serve both stops, so the routes-per-stop index answers
+        # this without a route search, keeping only routes that reach to_stop
+        # after from_stop; fall back to find_routes on a miss
+        route_numbers = data_loader.routes_in_travel_order(
+            request.from_stop,
+            request.to_stop,
+            sorted(
+                data_loader.get_routes_for_stop(request.from_stop)
+                & data_loader.get_routes_for_stop(request.to_stop)
+            )
+        )
+        if not route_numbers:
+            routes = route_engine.find_routes(request.from_stop, request.to_stop)
+            if not routes:
+                return {"error": "No routes found", "incoming_buses": []}
+            route_numbers = [route['route_number'] for route in routes]
         
         all_buses = []
-        for route in routes:
+        for route_number in route_numbers:
             result = eta_predictor.predict_eta(
-                route['route_number'],
+                route_number,
                 request.to_stop,
                 request.from_stop,
                 data_loader
@@ -328,35 +402,86 @@ async def get_bus_eta(request: ETARequest):
     
     return result
 
+# On the event loop for the same reason as /get-bus-eta
 @app.get("/get-incoming-buses/{stop_name}")
 async def get_incoming_buses(stop_name: str):
     """Get all incoming buses to a specific stop"""
     result = eta_predictor.get_all_incoming_buses(stop_name, data_loader)
     return result
 
+@lru_cache(maxsize=1)
+def _clock_string(epoch_second: int) -> str:
+    """Wall-clock HH:MM:SS, formatted once per second"""
+    return datetime.fromtimestamp(epoch_second).strftime('%H:%M:%S')
+
 @app.get("/live-bus-positions")
 async def get_live_bus_positions():
     """Get current positions of all tracked buses"""
-    buses = []
-    for bus_id, info in eta_predictor.live_bus_positions.items():
-        buses.append({
-            'bus_id': bus_id,
-            'route': info['route'],
-            'current_stop': info['current_stop'].get('stop_name', 'Unknown'),
-            'destination': info.get('destination', 'Terminus'),
-            'direction': info.get('direction', 'forward'),
-            'latitude': info.get('current_lat', info['current_stop'].get('latitude')),
-            'longitude': info.get('current_lng', info['current_stop'].get('longitude')),
-            'last_update': info['last_ticket_time'].strftime('%H:%M:%S'),
-            'delay_status': eta_predictor._get_delay_status(info['delay_minutes']),
-            'passengers': info['passengers']
-        })
+    buses = eta_predictor.get_live_positions()
     return {
         'total_buses': len(buses),
-        'timestamp': datetime.now().strftime('%H:%M:%S'),
+        'timestamp': _clock_string(int(time.time())),
         'buses': buses
     }
 
+def _sse_event(event: str, data) -> bytes:
+    """Encode one Server-Sent Event frame"""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+SSE_QUEUE_SIZE = 1000  # Per-client backlog before deltas are dropped
+SSE_KEEPALIVE_SECONDS = 15
+
+# Connected stream clients, one queue of encoded frames each. Touched only
+# on the event loop; the shared listener below is registered while any
+# client is connected.
+_sse_queues = set()
+_sse_loop = None
+
+def _offer_frame(frame: bytes):
+    """Queue a frame for every client; slow clients drop deltas rather than grow memory"""
+    for queue in _sse_queues:
+        if not queue.full():
+            queue.put_nowait(frame)
+
+def _broadcast_position(bus_id, position):
+    """Position listener shared by all clients: encode each delta once, fan out on the loop"""
+    # Fan out on the streams' event loop; call_soon_threadsafe works from any thread
+    _sse_loop.call_soon_threadsafe(_offer_frame, _sse_event('position', position))
+
+@app.get("/live-bus-positions/stream")
+async def stream_live_bus_positions(request: Request):
+    """
+    Stream live bus positions as Server-Sent Events
+    Sends one 'snapshot' event, then a 'position' event per bus update
+    """
+    queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+    
+    async def event_stream():
+        global _sse_loop
+        _sse_loop = asyncio.get_running_loop()
+        if not _sse_queues:
+            eta_predictor.add_position_listener(_broadcast_position)
+        _sse_queues.add(queue)
+        try:
+            yield _sse_event('snapshot', await get_live_bus_positions())
+            while not await request.is_disconnected():
+                try:
+                    frame = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield frame
+        finally:
+            _sse_queues.discard(queue)
+            if not _sse_queues:
+                eta_predictor.remove_position_listener(_broadcast_position)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
 @app.post("/update-bus-position")
 async def update_bus_position(bus_id: str, stop_id: str, ticket_count: int = 1):
     """
@@ -392,146 +517,128 @@ async def retrain_eta():
     result = eta_predictor.retrain_model()
     return result
 
+@lru_cache(maxsize=1)
+def _all_stops_with_routes_body(cache_version: int) -> bytes:
+    """Serialized /get-all-stops-with-routes payload, built once per data version"""
+    return orjson.dumps(data_loader.all_stops_with_routes)
+
+# Warm the cache so the first client doesn't pay for the build
+_all_stops_with_routes_body(data_loader.cache_version)
+
 @app.get("/get-all-stops-with-routes")
 async def get_all_stops_with_routes():
     """
     Get ALL stops with their routes for client-side filtering
     This loads once and filters on frontend for instant autocomplete
     """
-    stops = []
-    seen = set()
-    
-    # Primary source: route_stops_index (cleaned stop names from route_stop_ordered.csv)
-    for route_num, route_stops in data_loader.route_stops_index.items():
-        for stop in route_stops:
-            stop_name = stop['stop_name']
-            stop_key = stop_name.lower()
-            
-            if stop_key in seen:
-                # Add route to existing stop
-                for s in stops:
-                    if s['stop_name'].lower() == stop_key:
-                        if route_num not in s['routes']:
-                            s['routes'].append(route_num)
-                        break
-                continue
-            
-            seen.add(stop_key)
-            stops.append({
-                'stop_id': stop['stop_id'],
-                'stop_name': stop_name,
-                'latitude': float(stop['latitude']),
-                'longitude': float(stop['longitude']),
-                'routes': [route_num]
-            })
-    
-    # Sort by number of routes (important stops first)
-    stops.sort(key=lambda x: -len(x['routes']))
-    
-    return {
-        "total": len(stops),
-        "stops": stops
-    }
+    return Response(
+        content=_all_stops_with_routes_body(data_loader.cache_version),
+        media_type="application/json",
+        headers={"Cache-Control": STATIC_CACHE_CONTROL}
+    )
 
-@app.get("/get-destination-stops")
-async def get_destination_stops(from_stop: str):
+@lru_cache(maxsize=4096)
+def _compute_destination_stops(from_stop_lower: str, cache_version: int) -> tuple:
     """
-    Get all stops reachable from the source stop
-    Only returns stops that come AFTER the source on the SAME routes
+    Destination stops for a normalized source stop name
+    Cached per data version, returns (source_routes, destination_stops) tuples
     """
-    destinations = []
-    seen = set()
-    from_stop_lower = from_stop.lower().strip()
-    
-    print(f"\n📍 Finding destinations from: '{from_stop}'")
-    
-    # Get routes passing through source stop
-    source_routes = data_loader.get_routes_for_stop(from_stop)
+    destinations_by_stop = {}  # stop_key -> entry
     
-    # If not found, try partial match
-    if not source_routes:
-        for stop_name, routes in data_loader.stop_to_routes.items():
-            if from_stop_lower in stop_name or stop_name in from_stop_lower:
-                source_routes = routes
-                print(f"   Found via partial match: {stop_name} -> routes: {routes}")
-                break
-    
-    print(f"   Source routes: {source_routes}")
-    
-    if not source_routes:
-        return {
-            "from_stop": from_stop,
-            "source_routes": [],
-            "total_destinations": 0,
-            "destination_stops": [],
-            "error": "No routes found for this stop"
-        }
+    # Get routes passing through source stop (already falls back to partial matches)
+    source_routes = data_loader.get_routes_for_stop(from_stop_lower)
+    related_names = None
     
     for route in source_routes:
-        stops = data_loader.get_route_stops(route)
-        print(f"   Route {route}: {len(stops)} stops")
+        stops = data_loader.get_route_stops_view(route)
         
-        # Find source stop sequence in this route
-        source_seq = None
-        for stop in stops:
-            stop_name_lower = stop['stop_name'].lower()
-            # Match by exact name or partial match
-            if stop_name_lower == from_stop_lower or from_stop_lower in stop_name_lower or stop_name_lower in from_stop_lower:
-                source_seq = stop['sequence']
-                print(f"      Found source at seq {source_seq}: {stop['stop_name']}")
-                break
+        # Find source stop sequence in this route (exact index hit, else partial match)
+        source_seq = data_loader.route_stop_seq[route].get(from_stop_lower)
+        if source_seq is None:
+            if related_names is None:
+                related_names = data_loader.stop_matcher.related(from_stop_lower)
+            for stop in stops:
+                if stop['stop_name_lower'] in related_names:
+                    source_seq = stop['sequence']
+                    break
         
         if source_seq is None:
-            print(f"      Source not found in route {route}")
             continue
         
         # Get all stops AFTER source (these are valid destinations)
-        for stop in stops:
+        start = bisect_right(data_loader.route_sequences[route], source_seq)
+        for stop in islice(stops, start, None):
             if stop['sequence'] > source_seq:
-                stop_key = stop['stop_name'].lower()
+                stop_key = stop['stop_name_lower']
                 stops_away = stop['sequence'] - source_seq
                 
-                if stop_key not in seen:
-                    seen.add(stop_key)
-                    destinations.append({
+                entry = destinations_by_stop.get(stop_key)
+                if entry is None:
+                    destinations_by_stop[stop_key] = {
                         'stop_id': stop['stop_id'],
                         'stop_name': stop['stop_name'],
                         'latitude': stop.get('latitude', 0),
                         'longitude': stop.get('longitude', 0),
-                        'routes': [str(route)],
+                        'routes': {str(route)},
                         'stops_away': stops_away
-                    })
+                    }
                 else:
                     # Add route to existing destination
-                    for d in destinations:
-                        if d['stop_name'].lower() == stop_key:
-                            if str(route) not in d['routes']:
-                                d['routes'].append(str(route))
-                            # Keep minimum stops_away
-                            d['stops_away'] = min(d['stops_away'], stops_away)
-                            break
+                    entry['routes'].add(str(route))
+                    # Keep minimum stops_away
+                    entry['stops_away'] = min(entry['stops_away'], stops_away)
+    
+    # Routes are accumulated as sets, emit them as sorted lists
+    for entry in destinations_by_stop.values():
+        entry['routes'] = sorted(entry['routes'])
     
     # Sort by stops_away (nearest first)
-    destinations.sort(key=lambda x: x['stops_away'])
+    destinations = sorted(destinations_by_stop.values(), key=lambda x: x['stops_away'])
     
-    print(f"   Total destinations found: {len(destinations)}")
+    return tuple(source_routes), tuple(destinations)
+
+@lru_cache(maxsize=256)
+def _destination_stops_body(from_stop: str, cache_version: int) -> bytes:
+    """Serialized /get-destination-stops payload for one source stop and data version"""
+    source_routes, destinations = _compute_destination_stops(
+        from_stop.lower().strip(), cache_version
+    )
     
-    return {
+    if not source_routes:
+        return orjson.dumps({
+            "from_stop": from_stop,
+            "source_routes": [],
+            "total_destinations": 0,
+            "destination_stops": [],
+            "error": "No routes found for this stop"
+        })
+    
+    return orjson.dumps({
         "from_stop": from_stop,
-        "source_routes": list(source_routes),
+        "source_routes": source_routes,
         "total_destinations": len(destinations),
         "destination_stops": destinations
-    }
+    })
+
+@app.get("/get-destination-stops")
+def get_destination_stops(from_stop: str):
+    """
+    Get all stops reachable from the source stop
+    Only returns stops that come AFTER the source on the SAME routes
+    """
+    return Response(
+        content=_destination_stops_body(from_stop, data_loader.cache_version),
+        media_type="application/json"
+    )
 
 # Add these routes if not already present:
 
 @app.get("/api/routes")
 async def get_all_routes():
     """Get list of all available routes"""
-    routes = list(data_loader.route_stops_index.keys())
     return {
-        "total": len(routes),
-        "routes": sorted(routes)
+        "total": len(data_loader.sorted_routes),
+        "routes": data_loader.sorted_routes
     }
 
 @app.get("/api/route/{route_number}/stops")
@@ -556,4 +663,16 @@ async def get_route_coordinates(route_number: str):
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # Each worker is a separate process with its own DataLoader, models and
+    # simulated live buses, so stay single-process unless WEB_CONCURRENCY is set
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    # uvloop/httptools come with uvicorn[standard]; access logging costs ~25% throughput
+    uvicorn.run(
+        "app:app" if workers > 1 else app,
+        host="0.0.0.0",
+        port=port,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        access_log=False
+    )
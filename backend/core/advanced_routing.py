@@ -3,11 +3,87 @@ Advanced Route Features - Emergency Routing, Accessibility Mode, and Heatmaps
 """
 
 from typing import List, Dict, Optional, Tuple
-from math import radians, cos, sin, sqrt, atan2
-from collections import defaultdict
+from math import radians, cos, sin, sqrt, asin
 import heapq
+import sys
+import threading
+import numpy as np
+from scipy.spatial import cKDTree
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, kernels fall back to NumPy
+    njit = None
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LNG_EQUATOR = 111.320
+
+
+def _haversine_arr_loop(lat0, lng0, lats, lngs, out):
+    """out[i] = km from (lat0, lng0) to (lats[i], lngs[i]), all in radians"""
+    cos_lat0 = cos(lat0)
+    for i in range(lats.shape[0]):
+        a = (sin((lats[i] - lat0) / 2) ** 2
+             + cos_lat0 * cos(lats[i]) * sin((lngs[i] - lng0) / 2) ** 2)
+        out[i] = 2 * EARTH_RADIUS_KM * asin(sqrt(min(a, 1.0)))
+    return out
+
+
+def _haversine_arr_numpy(lat0, lng0, lats, lngs, out):
+    """NumPy version of _haversine_arr_loop for when numba is unavailable"""
+    a = np.sin((lats - lat0) / 2) ** 2 + cos(lat0) * np.cos(lats) * np.sin((lngs - lng0) / 2) ** 2
+    out[:] = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    return out
+
+
+def _nearest_point_loop(lat0, lng0, lats, lngs):
+    """
+    (index, km) of the point in (lats, lngs) nearest to (lat0, lng0), radians in
+    Haversine and argmin fused in one sweep, no temporary arrays
+    """
+    cos_lat0 = cos(lat0)
+    best_idx = 0
+    best_a = 2.0  # haversine a is at most 1
+    for i in range(lats.shape[0]):
+        a = (sin((lats[i] - lat0) / 2) ** 2
+             + cos_lat0 * cos(lats[i]) * sin((lngs[i] - lng0) / 2) ** 2)
+        # a grows monotonically with distance, so rank on it directly
+        if a < best_a:
+            best_a = a
+            best_idx = i
+    return best_idx, 2 * EARTH_RADIUS_KM * asin(sqrt(min(best_a, 1.0)))
+
+
+if njit is not None:
+    _haversine_arr = njit(fastmath=True, cache=True)(_haversine_arr_loop)
+    _nearest_point = njit(fastmath=True, cache=True)(_nearest_point_loop)
+else:
+    _haversine_arr = _haversine_arr_numpy
+    _nearest_point = None  # Plain-float ranking in AdvancedRouting is faster unjitted
+
+def _congestion_for_hour(hour: int) -> Tuple[str, float, int]:
+    """(level, factor, expected delay minutes) for an hour of the day"""
+    if 8 <= hour <= 10:
+        return 'high', 0.8, 15
+    elif 17 <= hour <= 20:
+        return 'very_high', 0.9, 20
+    elif 11 <= hour <= 16:
+        return 'moderate', 0.5, 8
+    return 'low', 0.2, 3
+
 
 class AdvancedRouting:
+    # Congestion by hour, looked up instead of re-walking the time ranges
+    _HOUR_TABLE = tuple(_congestion_for_hour(hour) for hour in range(24))
+    
+    _RECOMMENDATIONS = {
+        'low': 'Good time to travel. Expect minimal delays.',
+        'moderate': 'Normal traffic. Allow some buffer time.',
+        'high': 'Peak hours. Consider leaving early or using alternative routes.',
+        'very_high': 'Heavy traffic expected. Plan for significant delays.'
+    }
+    
     def __init__(self, data_loader):
         self.data_loader = data_loader
         
@@ -22,32 +98,123 @@ class AdvancedRouting:
                 {'name': 'Rajiv Gandhi Government General Hospital', 'lat': 13.0773, 'lng': 80.2887},
             ]
         }
+        
+        # Hospitals as parallel arrays for distance work; emergency_locations
+        # stays as the serialization view for external callers
+        hospitals = self.emergency_locations['hospitals']
+        self._hosp_names = [h['name'] for h in hospitals]
+        self._hosp_lat = np.array([h['lat'] for h in hospitals], dtype=np.float64)
+        self._hosp_lng = np.array([h['lng'] for h in hospitals], dtype=np.float64)
+        self._hosp_lat_r = np.radians(self._hosp_lat)
+        self._hosp_lng_r = np.radians(self._hosp_lng)
+        
+        # Plain-float radian pairs for single-point ranking
+        self._hosp_coords_r = tuple(zip(self._hosp_lat_r.tolist(), self._hosp_lng_r.tolist()))
+        
+        # Nearest stop to each hospital, filled per data version
+        self._hospital_stops = None
+        self._hospital_stops_version = None
+        self._hospital_stops_lock = threading.Lock()
+        
+        # Heatmap cell (lat, lng) of every route stop, filled per data version
+        self._route_stop_cells = None
+        self._route_stop_cells_version = None
+        
+        # Spatial index over route stops for walking-distance queries,
+        # built on first use per data version
+        self._stop_tree = None
+        self._stop_tree_names = None
+        self._stop_tree_version = None
+        self._cos_ref_lat = cos(radians(13.05))  # Chennai reference latitude
+        
+        # Heatmap only changes when route data is reloaded
+        self._heatmap_cache = None
+        self._heatmap_version = None
     
     def haversine_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """Calculate distance between two coordinates"""
-        R = 6371  # Earth's radius in km
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+        lat1, lon1, lat2, lon2 = radians(lat1), radians(lon1), radians(lat2), radians(lon2)
         dlat = lat2 - lat1
         dlon = lon2 - lon1
         a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        return R * c
+        # One sqrt + asin instead of two sqrts + atan2; clamp rounding noise
+        return 2 * EARTH_RADIUS_KM * asin(sqrt(min(a, 1.0)))
+    
+    def _locate_hospital(self, lat: float, lng: float) -> Tuple[int, float]:
+        """(index, distance km) of the nearest hospital to given coordinates"""
+        lat_r, lng_r = radians(lat), radians(lng)
+        if _nearest_point is not None:
+            idx, dist = _nearest_point(lat_r, lng_r, self._hosp_lat_r, self._hosp_lng_r)
+            return int(idx), float(dist)
+        
+        cos_lat = cos(lat_r)
+        
+        # Rank by flat-earth squared distance: same ordering as great-circle
+        # at city scale, without any trig per hospital (plain floats beat
+        # NumPy call overhead for a handful of points)
+        best_idx = 0
+        best_d2 = float('inf')
+        for idx, (h_lat, h_lng) in enumerate(self._hosp_coords_r):
+            d2 = (h_lat - lat_r) ** 2 + (cos_lat * (h_lng - lng_r)) ** 2
+            if d2 < best_d2:
+                best_d2 = d2
+                best_idx = idx
+        
+        # True distance only for the winner
+        dist = self.haversine_distance(
+            lat, lng, float(self._hosp_lat[best_idx]), float(self._hosp_lng[best_idx])
+        )
+        return best_idx, dist
+    
+    def _hospital_result(self, idx: int, dist: float) -> Dict:
+        """Hospital record with its distance"""
+        return {
+            'name': self._hosp_names[idx],
+            'lat': float(self._hosp_lat[idx]),
+            'lng': float(self._hosp_lng[idx]),
+            'distance_km': round(dist, 2)
+        }
     
     def find_nearest_hospital(self, lat: float, lng: float) -> Dict:
         """Find nearest hospital to given coordinates"""
-        min_dist = float('inf')
-        nearest = None
-        
-        for hospital in self.emergency_locations['hospitals']:
-            dist = self.haversine_distance(lat, lng, hospital['lat'], hospital['lng'])
-            if dist < min_dist:
-                min_dist = dist
-                nearest = {
-                    **hospital,
-                    'distance_km': round(dist, 2)
-                }
+        return self._hospital_result(*self._locate_hospital(lat, lng))
+    
+    def nearest_hospitals_batch(self, lats, lngs) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Nearest hospital for many points at once (degrees in)
+        Returns (hospital indices, distances in km)
+        """
+        lats_r = np.radians(np.asarray(lats, dtype=np.float64))
+        lngs_r = np.radians(np.asarray(lngs, dtype=np.float64))
+        indices = np.empty(len(lats_r), dtype=np.int64)
+        distances = np.empty(len(lats_r))
+        
+        if _nearest_point is not None:
+            for i in range(len(lats_r)):
+                indices[i], distances[i] = _nearest_point(
+                    lats_r[i], lngs_r[i], self._hosp_lat_r, self._hosp_lng_r
+                )
+            return indices, distances
         
-        return nearest
+        dist = np.empty(len(self._hosp_lat_r))
+        for i in range(len(lats_r)):
+            _haversine_arr(lats_r[i], lngs_r[i], self._hosp_lat_r, self._hosp_lng_r, dist)
+            indices[i] = dist.argmin()
+            distances[i] = dist[indices[i]]
+        
+        return indices, distances
+    
+    def _get_hospital_stops(self) -> List[Dict]:
+        """Nearest stop to every hospital, computed once per data version"""
+        version = self.data_loader.cache_version
+        with self._hospital_stops_lock:
+            if self._hospital_stops is None or self._hospital_stops_version != version:
+                self._hospital_stops = [
+                    self.data_loader.find_nearest_stop(h_lat, h_lng)
+                    for h_lat, h_lng in zip(self._hosp_lat.tolist(), self._hosp_lng.tolist())
+                ]
+                self._hospital_stops_version = version
+            return self._hospital_stops
     
     def emergency_route(self, source_lat: float, source_lng: float) -> Dict:
         """
@@ -57,13 +224,11 @@ class AdvancedRouting:
         nearest_stop = self.data_loader.find_nearest_stop(source_lat, source_lng)
         
         # Find nearest hospital
-        nearest_hospital = self.find_nearest_hospital(source_lat, source_lng)
+        hospital_idx, hospital_dist = self._locate_hospital(source_lat, source_lng)
+        nearest_hospital = self._hospital_result(hospital_idx, hospital_dist)
         
-        # Find stop nearest to hospital
-        hospital_stop = self.data_loader.find_nearest_stop(
-            nearest_hospital['lat'], 
-            nearest_hospital['lng']
-        )
+        # Stop nearest to hospital (hospitals are fixed, so this is precomputed)
+        hospital_stop = self._get_hospital_stops()[hospital_idx]
         
         return {
             'emergency_type': 'hospital',
@@ -79,61 +244,164 @@ class AdvancedRouting:
         Find routes with minimal walking distance
         Useful for elderly, disabled, or passengers with heavy luggage
         """
-        # Get all valid routes
-        # Filter routes where stops are within max_walking_distance of actual source/destination
+        source_stop = self.data_loader.find_stop_by_name(source)
+        dest_stop = self.data_loader.find_stop_by_name(destination)
+        if not source_stop or not dest_stop:
+            return []
+        
+        # Stops within walking distance of each end, name -> metres
+        radius_km = max_walking_distance_m / 1000
+        boarding = self._stops_within(source_stop['latitude'], source_stop['longitude'], radius_km)
+        alighting = self._stops_within(dest_stop['latitude'], dest_stop['longitude'], radius_km)
+        if not boarding or not alighting:
+            return []
+        
+        # Only routes serving a stop near both ends can qualify
+        stop_to_routes = self.data_loader.stop_to_routes
+        board_routes = set().union(*(stop_to_routes.get(name, ()) for name in boarding))
+        alight_routes = set().union(*(stop_to_routes.get(name, ()) for name in alighting))
+        
         routes = []
+        for route in board_routes & alight_routes:
+            # Least total walking for a boarding stop before the alighting stop
+            best = None
+            best_board = None  # (walk_m, stop) with least walking so far on this route
+            for stop in self.data_loader.get_route_stops_view(route):
+                name = stop['stop_name_lower']
+                if best_board is not None and name in alighting:
+                    walk = best_board[0] + alighting[name]
+                    if best is None or walk < best[0]:
+                        best = (walk, best_board[0], best_board[1], alighting[name], stop)
+                if name in boarding and (best_board is None or boarding[name] < best_board[0]):
+                    best_board = (boarding[name], stop)
+            
+            if best is not None:
+                total_walk, board_walk, board_stop, alight_walk, alight_stop = best
+                routes.append({
+                    'route_number': route,
+                    'board_stop': board_stop['stop_name'],
+                    'alight_stop': alight_stop['stop_name'],
+                    'walk_to_board_m': round(board_walk),
+                    'walk_from_alight_m': round(alight_walk),
+                    'total_walking_m': round(total_walk),
+                    'stops': alight_stop['sequence'] - board_stop['sequence']
+                })
         
-        # For now, return all direct routes as accessibility-friendly
-        # In production, this would calculate walking distance from user's exact location
+        routes.sort(key=lambda r: (r['total_walking_m'], r['stops']))
         return routes
     
-    def calculate_bus_density_heatmap(self) -> List[Dict]:
+    def _project_km(self, lats, lngs) -> np.ndarray:
+        """Equirectangular projection to local (x, y) km around Chennai"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        return np.column_stack((
+            lngs * KM_PER_DEG_LNG_EQUATOR * self._cos_ref_lat,
+            lats * KM_PER_DEG_LAT
+        ))
+    
+    def _get_stop_tree(self) -> Tuple[cKDTree, List[str]]:
+        """KD-tree over distinct route stops, rebuilt when the data version changes"""
+        version = self.data_loader.cache_version
+        if self._stop_tree is None or self._stop_tree_version != version:
+            names, lats, lngs = [], [], []
+            seen = set()
+            for stops in self.data_loader.route_stops_index.values():
+                for stop in stops:
+                    if stop['stop_name_lower'] not in seen:
+                        seen.add(stop['stop_name_lower'])
+                        names.append(stop['stop_name_lower'])
+                        lats.append(stop['latitude'])
+                        lngs.append(stop['longitude'])
+            self._stop_tree = cKDTree(self._project_km(lats, lngs))
+            self._stop_tree_names = names
+            self._stop_tree_version = version
+        return self._stop_tree, self._stop_tree_names
+    
+    def _stops_within(self, lat: float, lng: float, radius_km: float) -> Dict[str, float]:
+        """Route stops within radius of a point, stop_name_lower -> walking metres"""
+        tree, names = self._get_stop_tree()
+        point = self._project_km([lat], [lng])[0]
+        nearby = {}
+        for idx in tree.query_ball_point(point, radius_km):
+            nearby[names[idx]] = float(np.hypot(*(tree.data[idx] - point))) * 1000
+        return nearby
+    
+    def calculate_bus_density_heatmap(self) -> Dict[str, np.ndarray]:
         """
         Calculate bus density for heatmap visualization
-        Returns list of coordinates with intensity values
+        Returns parallel float32 arrays {'lat', 'lng', 'weight'}, one entry
+        per ~100m cell; serialize with orjson.OPT_SERIALIZE_NUMPY
+        """
+        version = self.data_loader.cache_version
+        if self._heatmap_cache is not None and self._heatmap_version == version:
+            return self._heatmap_cache
+        
+        ilat, ilng = self._get_route_stop_cells()
+        if not len(ilat):
+            empty = np.empty(0, dtype=np.float32)
+            return {'lat': empty, 'lng': empty, 'weight': empty}
+        
+        # Pack both cell indices into one int64 key
+        packed = (ilat.astype(np.int64) << 32) | (ilng.astype(np.int64) & 0xffffffff)
+        
+        # Count how many route stops fall in each cell
+        cells, counts = np.unique(packed, return_counts=True)
+        
+        # Unpack to int32 cell indices, then scale straight into float32 in
+        # one pass each (a correctly rounded divide keeps 3-decimal output)
+        cell_lat = (cells >> 32).astype(np.int32)
+        cell_lng = (cells & 0xffffffff).astype(np.uint32).view(np.int32)
+        scale = np.float32(1000)
+        
+        self._heatmap_cache = {
+            'lat': cell_lat.astype(np.float32) / scale,
+            'lng': cell_lng.astype(np.float32) / scale,
+            'weight': counts.astype(np.float32) / np.float32(counts.max())  # Normalized intensity
+        }
+        self._heatmap_version = version
+        return self._heatmap_cache
+    
+    def calculate_bus_density_heatmap_dicts(self) -> List[Dict]:
+        """Heatmap as a list of {'lat', 'lng', 'weight'} dicts (legacy shape)"""
+        heatmap = self.calculate_bus_density_heatmap()
+        # Re-round the float32 cell centres so they print as 3-decimal floats
+        lats = np.round(heatmap['lat'].astype(np.float64), 3).tolist()
+        lngs = np.round(heatmap['lng'].astype(np.float64), 3).tolist()
+        return [
+            {'lat': lat, 'lng': lng, 'weight': weight}
+            for lat, lng, weight in zip(lats, lngs, heatmap['weight'].tolist())
+        ]
+    
+    def _get_route_stop_cells(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        ~100m cell indices (round(coord * 1000)) of every (route, stop) pair,
+        computed once per data version
         """
-        stop_frequency = defaultdict(int)
-        
-        # Count how many routes pass through each stop
-        for route_num, stops in self.data_loader.route_stops_index.items():
-            for stop in stops:
-                key = (round(stop['latitude'], 3), round(stop['longitude'], 3))
-                stop_frequency[key] += 1
-        
-        # Convert to heatmap format
-        heatmap_data = []
-        max_frequency = max(stop_frequency.values()) if stop_frequency else 1
-        
-        for (lat, lng), frequency in stop_frequency.items():
-            heatmap_data.append({
-                'lat': lat,
-                'lng': lng,
-                'weight': frequency / max_frequency  # Normalized intensity
-            })
-        
-        return heatmap_data
+        version = self.data_loader.cache_version
+        if self._route_stop_cells is None or self._route_stop_cells_version != version:
+            stops = [
+                stop for stops in self.data_loader.route_stops_index.values() for stop in stops
+            ]
+            lats = np.fromiter((stop['latitude'] for stop in stops), dtype=np.float64, count=len(stops))
+            lngs = np.fromiter((stop['longitude'] for stop in stops), dtype=np.float64, count=len(stops))
+            # Quantize in float64 so cells match round(coord, 3) exactly, then
+            # keep only 32-bit indices for the per-call pipeline
+            self._route_stop_cells = (
+                np.round(lats * 1000).astype(np.int32),
+                np.round(lngs * 1000).astype(np.int32)
+            )
+            self._route_stop_cells_version = version
+        return self._route_stop_cells
     
     def get_route_congestion_prediction(self, route_number: str, time_of_day: int) -> Dict:
         """
         Predict route congestion based on time and historical patterns
         """
-        # Congestion factors based on time
-        if 8 <= time_of_day <= 10:
-            congestion_level = 'high'
-            congestion_factor = 0.8
-            expected_delay = 15  # minutes
-        elif 17 <= time_of_day <= 20:
-            congestion_level = 'very_high'
-            congestion_factor = 0.9
-            expected_delay = 20
-        elif 11 <= time_of_day <= 16:
-            congestion_level = 'moderate'
-            congestion_factor = 0.5
-            expected_delay = 8
+        # Congestion factors based on time (expected delay in minutes)
+        if 0 <= time_of_day < 24:
+            congestion_level, congestion_factor, expected_delay = self._HOUR_TABLE[time_of_day]
         else:
-            congestion_level = 'low'
-            congestion_factor = 0.2
-            expected_delay = 3
+            congestion_level, congestion_factor, expected_delay = _congestion_for_hour(time_of_day)
         
         return {
             'route_number': route_number,
@@ -145,13 +413,7 @@ class AdvancedRouting:
     
     def _get_congestion_recommendation(self, level: str) -> str:
         """Get recommendation based on congestion level"""
-        recommendations = {
-            'low': 'Good time to travel. Expect minimal delays.',
-            'moderate': 'Normal traffic. Allow some buffer time.',
-            'high': 'Peak hours. Consider leaving early or using alternative routes.',
-            'very_high': 'Heavy traffic expected. Plan for significant delays.'
-        }
-        return recommendations.get(level, 'No specific recommendation.')
+        return self._RECOMMENDATIONS.get(level, 'No specific recommendation.')
 
 
 class TransferRouteEngine:
@@ -161,6 +423,43 @@ class TransferRouteEngine:
         self.data_loader = data_loader
         self.MAX_TRANSFERS = 2
         self.MAX_WALKING_DISTANCE_KM = 0.5
+        self.MAX_OPTIONS = 5
+        self.MINUTES_PER_STOP = 3  # ~3 min per stop
+        self.TRANSFER_WAIT_MINUTES = 10  # Average wait time for next bus
+        
+        # Per-route caches, dropped whenever the data version changes
+        self._route_name_set: Dict[str, frozenset] = {}
+        self._route_name_seq: Dict[str, Dict[str, Optional[int]]] = {}
+        self._index_version = None
+    
+    def _check_index_version(self):
+        """Drop per-route caches if the route data was reloaded"""
+        version = self.data_loader.cache_version
+        if self._index_version != version:
+            self._route_name_set.clear()
+            self._route_name_seq.clear()
+            self._index_version = version
+    
+    def _ensure_route_index(self, route: str) -> frozenset:
+        """Lowercase stop names of a route, built on first use"""
+        names = self._route_name_set.get(route)
+        if names is None:
+            stops = self.data_loader.get_route_stops(route)
+            names = frozenset(s['stop_name_lower'] for s in stops)
+            self._route_name_set[route] = names
+            self._route_name_seq[route] = {}
+        return names
+    
+    def _stop_sequence(self, route: str, stop_key: str) -> Optional[int]:
+        """
+        Memoized get_stop_sequence_in_route (same fuzzy matching rules)
+        stop_key must already be lowercase
+        """
+        self._ensure_route_index(route)
+        seq_by_name = self._route_name_seq[route]
+        if stop_key not in seq_by_name:
+            seq_by_name[stop_key] = self.data_loader.get_stop_sequence_in_route(route, stop_key)
+        return seq_by_name[stop_key]
     
     def find_routes_with_transfers(self, source: str, destination: str, 
                                    max_transfers: int = 1) -> List[Dict]:
@@ -168,6 +467,12 @@ class TransferRouteEngine:
         Find routes that require transfers between buses
         Uses BFS to find optimal transfer points
         """
+        self._check_index_version()
+        
+        # Normalize once; interned keys compare by identity in the indexes
+        source_key = sys.intern(source.lower())
+        dest_key = sys.intern(destination.lower())
+        
         # Get routes from source
         source_routes = set(self.data_loader.get_routes_for_stop(source))
         dest_routes = set(self.data_loader.get_routes_for_stop(destination))
@@ -179,64 +484,77 @@ class TransferRouteEngine:
             # Direct routes exist, no need for transfers
             return []
         
-        # Find transfer routes
-        transfer_routes = []
+        # Keep only the best MAX_OPTIONS as a max-heap of
+        # (-total_time, -found_order, route); ties go to the earlier find
+        best = []
+        found = 0
         
-        # For each route from source
+        # Walk each source route's stops and ask the stop -> routes index
+        # which destination routes also serve that stop (transfer points).
+        # Direction checks run inline on cached sequences, so dead ends never
+        # reach _build_transfer_route
+        stop_to_routes = self.data_loader.stop_to_routes
         for source_route in source_routes:
-            source_stops = self.data_loader.get_route_stops(source_route)
-            source_stop_names = {s['stop_name'].lower() for s in source_stops}
+            source_seq = self._stop_sequence(source_route, source_key)
+            if not source_seq:
+                continue
             
-            # Find potential transfer points
-            for dest_route in dest_routes:
-                dest_stops = self.data_loader.get_route_stops(dest_route)
-                dest_stop_names = {s['stop_name'].lower() for s in dest_stops}
-                
-                # Find common stops (transfer points)
-                transfer_points = source_stop_names.intersection(dest_stop_names)
+            for transfer_stop in self._ensure_route_index(source_route):
+                # First leg must run source -> transfer_stop
+                transfer_seq_1 = self._stop_sequence(source_route, transfer_stop)
+                if not transfer_seq_1 or transfer_seq_1 <= source_seq:
+                    continue
                 
-                for transfer_stop in transfer_points:
-                    # Validate transfer is in correct direction
+                for dest_route in stop_to_routes.get(transfer_stop, frozenset()) & dest_routes:
+                    # Second leg must run transfer_stop -> destination
+                    transfer_seq_2 = self._stop_sequence(dest_route, transfer_stop)
+                    dest_seq = self._stop_sequence(dest_route, dest_key)
+                    if not transfer_seq_2 or not dest_seq or dest_seq <= transfer_seq_2:
+                        continue
+                    
+                    # Skip options that cannot beat the current worst kept one
+                    total_stops = (transfer_seq_1 - source_seq) + (dest_seq - transfer_seq_2)
+                    total_time = total_stops * self.MINUTES_PER_STOP + self.TRANSFER_WAIT_MINUTES
+                    if len(best) >= self.MAX_OPTIONS and total_time >= -best[0][0]:
+                        continue
+                    
                     transfer_route = self._build_transfer_route(
-                        source, destination, 
+                        source, destination,
                         source_route, dest_route,
-                        transfer_stop
+                        transfer_stop,
+                        (source_seq, transfer_seq_1, transfer_seq_2, dest_seq)
                     )
                     
-                    if transfer_route:
-                        transfer_routes.append(transfer_route)
+                    found += 1
+                    entry = (-total_time, -found, transfer_route)
+                    if len(best) < self.MAX_OPTIONS:
+                        heapq.heappush(best, entry)
+                    else:
+                        heapq.heapreplace(best, entry)
         
         # Sort by total time
-        transfer_routes.sort(key=lambda x: x.get('total_estimated_time', float('inf')))
+        best.sort(key=lambda entry: (-entry[0], -entry[1]))
         
-        return transfer_routes[:5]  # Return top 5 options
+        return [entry[2] for entry in best]  # Return top options
     
     def _build_transfer_route(self, source: str, destination: str,
                               first_route: str, second_route: str,
-                              transfer_stop: str) -> Optional[Dict]:
-        """Build a complete transfer route"""
-        # Validate first leg: source -> transfer_stop
-        source_seq = self.data_loader.get_stop_sequence_in_route(first_route, source)
-        transfer_seq_1 = self.data_loader.get_stop_sequence_in_route(first_route, transfer_stop)
-        
-        if not source_seq or not transfer_seq_1 or transfer_seq_1 <= source_seq:
-            return None
-        
-        # Validate second leg: transfer_stop -> destination
-        transfer_seq_2 = self.data_loader.get_stop_sequence_in_route(second_route, transfer_stop)
-        dest_seq = self.data_loader.get_stop_sequence_in_route(second_route, destination)
-        
-        if not transfer_seq_2 or not dest_seq or dest_seq <= transfer_seq_2:
-            return None
+                              transfer_stop: str, sequences: Tuple[int, int, int, int]) -> Dict:
+        """
+        Build a complete transfer route
+        sequences = (source, transfer on first route, transfer on second
+        route, destination), already validated by the caller
+        """
+        source_seq, transfer_seq_1, transfer_seq_2, dest_seq = sequences
         
         # Calculate metrics for each leg
         first_leg_stops = transfer_seq_1 - source_seq
         second_leg_stops = dest_seq - transfer_seq_2
         
         # Estimate times (simplified)
-        first_leg_time = first_leg_stops * 3  # ~3 min per stop
-        second_leg_time = second_leg_stops * 3
-        transfer_wait_time = 10  # Average wait time for next bus
+        first_leg_time = first_leg_stops * self.MINUTES_PER_STOP
+        second_leg_time = second_leg_stops * self.MINUTES_PER_STOP
+        transfer_wait_time = self.TRANSFER_WAIT_MINUTES
         
         return {
             'type': 'transfer_route',
@@ -2,11 +2,65 @@
 Data Layer - Load and manage CSV datasets
 """
 
+import numpy as np
 import pandas as pd
+import glob
+import hashlib
 import os
+import pickle
+import re
+import sys
 from typing import List, Dict, Optional
 from collections import defaultdict
+from functools import lru_cache
 from urllib.parse import unquote
+from scipy.spatial import cKDTree
+
+from .stop_trie import StopTrie
+from .substring_matcher import SubstringMatcher
+
+try:
+    import pyarrow  # noqa: F401
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
+
+# Column types declared up front so read_csv skips inference
+_STOPS_DTYPES = {'stop_id': 'int64', 'stop_name': str, 'latitude': 'float64', 'longitude': 'float64'}
+_BUS_STOPS_DTYPES = {'stop_id': str, 'stop_name': str, 'latitude': 'float64', 'longitude': 'float64'}
+_ROUTE_STOPS_DTYPES = {
+    'route_number': str, 'stop_id': str, 'stop_sequence': 'int64',
+    'stop_name': str, 'latitude': 'float64', 'longitude': 'float64'
+}
+_EDGES_DTYPES = {'route_number': str, 'from_stop': 'int64', 'to_stop': 'int64', 'distance_km': 'float64'}
+
+_CSV_FILES = ("cleaned_all_stops.csv", "chennai_bus_stops.csv", "route_stop_ordered.csv", "route_edges.csv")
+
+# Per-load state left out of the snapshot: memo tables are rebuilt, the
+# graphs stay lazy, and the rest describes this process, not the data
+_SNAPSHOT_SKIP = {
+    'base_path', 'cache_dir', 'cache_version', '_loaded',
+    '_graph', '_route_graph', '_routes_for_stop_cached', '_stop_by_name_cached',
+}
+
+# Suffixes stripped when normalizing stop names: (12.9910N), (Route M1), #2
+_NORM_COORD = re.compile(r'\s*\([\d.]+n\)')
+_NORM_ROUTE = re.compile(r'\s*\(route\s+\w+\)')
+_NORM_HASH = re.compile(r'\s*#\d+')
+
+
+# URL-decode every element of an object array in one ufunc call
+_unquote_array = np.frompyfunc(unquote, 1, 1)
+
+
+@lru_cache(maxsize=8192)
+def normalize_stop_name(name: str) -> str:
+    """Lowercase a stop name and strip coordinate suffixes and route tags"""
+    name = name.lower().strip()
+    name = _NORM_COORD.sub('', name)
+    name = _NORM_ROUTE.sub('', name)
+    name = _NORM_HASH.sub('', name)
+    return name.strip()
 
 class DataLoader:
     def __init__(self):
@@ -19,54 +73,36 @@ class DataLoader:
         root_dir = os.path.dirname(backend_dir)
         
         self.base_path = os.getenv("DATA_BASE_PATH", root_dir)
+        # Pickled snapshots of the parsed data, keyed on the CSV mtimes
+        self.cache_dir = os.getenv("DATA_CACHE_DIR", os.path.join(backend_dir, ".cache"))
             
         print(f"📂 Initializing DataLoader with base path: {self.base_path}")
-        self.stops_df = None
         self.route_stops_df = None
         self.route_edges_df = None
         self.bus_stops_df = None  # Real stop names
-        self.graph = defaultdict(list)
-        self.route_graph = defaultdict(dict)
+        self._graph = None  # Built on first access, see the graph property
+        self._route_graph = None
         self._loaded = False
+        self.cache_version = 0  # Bumped on every (re)load to invalidate derived caches
         self._load_data()
     
     def _load_data(self):
         """Load all CSV datasets into memory"""
         try:
-            # Load stops dataset
-            stops_path = os.path.join(self.base_path, "cleaned_all_stops.csv")
-            self.stops_df = pd.read_csv(stops_path)
-            self.stops_df['stop_name_lower'] = self.stops_df['stop_name'].str.lower()
-            
-            # Load chennai_bus_stops.csv with REAL stop names
-            bus_stops_path = os.path.join(self.base_path, "chennai_bus_stops.csv")
-            if os.path.exists(bus_stops_path):
-                self.bus_stops_df = pd.read_csv(bus_stops_path, header=None, 
-                                                 names=['stop_id', 'stop_name', 'latitude', 'longitude'])
-                # Decode URL-encoded names and clean them
-                self.bus_stops_df['stop_name'] = self.bus_stops_df['stop_name'].apply(
-                    lambda x: self._decode_stop_name(x) if pd.notna(x) else ''
-                )
-                # Filter out empty names
-                self.bus_stops_df = self.bus_stops_df[self.bus_stops_df['stop_name'].str.len() > 0]
-                print(f"   - Loaded real stop names: {len(self.bus_stops_df)}")
-            
-            # Load route ordered stops dataset
-            route_stops_path = os.path.join(self.base_path, "route_stop_ordered.csv")
-            self.route_stops_df = pd.read_csv(route_stops_path)
+            snapshot_path = self._snapshot_path()
+            if not self._load_snapshot(snapshot_path):
+                self._load_csvs()
+                self._save_snapshot(snapshot_path)
+            self._graph = self._route_graph = None  # Rebuilt lazily from the new edges
             
-            # Load route edges dataset
-            edges_path = os.path.join(self.base_path, "route_edges.csv")
-            self.route_edges_df = pd.read_csv(edges_path)
-            
-            # Build graph structures
-            self._build_stop_name_mapping()
-            self._build_graph()
-            self._build_route_index()
+            # Fresh memo tables per load, so a reload never serves stale lookups
+            self._routes_for_stop_cached = lru_cache(maxsize=4096)(self._routes_for_stop)
+            self._stop_by_name_cached = lru_cache(maxsize=4096)(self._find_stop_by_name)
             
             self._loaded = True
+            self.cache_version += 1
             print(f"✅ Data loaded successfully!")
-            print(f"   - Stops: {len(self.stops_df)}")
+            print(f"   - Stops: {len(self._stop_records)}")
             print(f"   - Route Stops: {len(self.route_stops_df)}")
             print(f"   - Route Edges: {len(self.route_edges_df)}")
             
@@ -76,17 +112,141 @@ class DataLoader:
             traceback.print_exc()
             self._loaded = False
     
-    def _decode_stop_name(self, name: str) -> str:
-        """Decode URL-encoded stop names"""
-        if not name or pd.isna(name):
-            return ''
+    def _load_csvs(self):
+        """Parse the CSV datasets and build every index from them"""
+        # Load stops dataset
+        stops_path = os.path.join(self.base_path, "cleaned_all_stops.csv")
+        stops_df = pd.read_csv(stops_path, usecols=list(_STOPS_DTYPES), dtype=_STOPS_DTYPES)
+        # Only the extracted columns are kept, not the DataFrame
+        self._build_stop_arrays(stops_df)
+        
+        # Load chennai_bus_stops.csv with REAL stop names
+        bus_stops_path = os.path.join(self.base_path, "chennai_bus_stops.csv")
+        if os.path.exists(bus_stops_path):
+            self.bus_stops_df = pd.read_csv(bus_stops_path, header=None, 
+                                             names=list(_BUS_STOPS_DTYPES), dtype=_BUS_STOPS_DTYPES)
+            # Decode URL-encoded names and clean them
+            self.bus_stops_df['stop_name'] = self._decode_stop_names(self.bus_stops_df['stop_name'])
+            # Filter out empty names
+            self.bus_stops_df = self.bus_stops_df[self.bus_stops_df['stop_name'].str.len() > 0]
+            print(f"   - Loaded real stop names: {len(self.bus_stops_df)}")
+        
+        # Load route ordered stops dataset
+        route_stops_path = os.path.join(self.base_path, "route_stop_ordered.csv")
+        self.route_stops_df = pd.read_csv(route_stops_path, dtype=_ROUTE_STOPS_DTYPES)
+        
+        # Load route edges dataset
+        edges_path = os.path.join(self.base_path, "route_edges.csv")
+        self.route_edges_df = pd.read_csv(
+            edges_path, usecols=list(_EDGES_DTYPES), dtype=_EDGES_DTYPES,
+            engine='pyarrow' if _HAS_PYARROW else 'c'
+        )
+        
+        # Build graph structures
+        self._build_stop_name_mapping()
+        self._build_edge_index()
+        self._narrow_edge_table()
+        self._build_route_index()
+        self._build_stop_trie()
+        self._build_all_stops_with_routes()
+    
+    def _snapshot_path(self) -> str:
+        """Snapshot file for the current CSVs and loader code"""
+        key = hashlib.md5()
+        sources = [os.path.join(self.base_path, name) for name in _CSV_FILES]
+        # Loader modules too, so an index layout change never reads an old pickle
+        core_dir = os.path.dirname(os.path.abspath(__file__))
+        sources += [os.path.join(core_dir, name)
+                    for name in ("data_loader.py", "stop_trie.py", "substring_matcher.py")]
+        for path in sources:
+            try:
+                stat = os.stat(path)
+                key.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+            except OSError:
+                key.update(f"{path}:missing;".encode())
+        key.update(f"{sys.version_info[:2]}:{pd.__version__}:{np.__version__}".encode())
+        return os.path.join(self.cache_dir, f"dataloader_{key.hexdigest()}.pkl")
+    
+    def _load_snapshot(self, path: str) -> bool:
+        """Restore parsed data from a snapshot, False if there is none usable"""
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'rb') as f:
+                self.__dict__.update(pickle.load(f))
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable data snapshot {path}: {e}")
+            return False
+        print(f"   - Restored data snapshot: {os.path.basename(path)}")
+        return True
+    
+    def _save_snapshot(self, path: str):
+        """Pickle parsed data so the next start skips CSV parsing"""
+        state = {k: v for k, v in self.__dict__.items() if k not in _SNAPSHOT_SKIP}
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write then rename, so concurrent workers never read a partial file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            # Snapshots of older CSVs can never match again
+            for stale in glob.glob(os.path.join(self.cache_dir, "dataloader_*.pkl")):
+                if stale != path:
+                    os.remove(stale)
+        except Exception as e:
+            print(f"⚠️ Could not write data snapshot: {e}")
+    
+    @staticmethod
+    def _arrow_strings(column: pd.Series) -> pd.Series:
+        """
+        Arrow-backed copy of a string column when pyarrow is installed, so
+        .str.contains runs in Arrow's compute kernels instead of per object
+        """
+        if not _HAS_PYARROW:
+            return column
+        # Empty instead of missing keeps == masks plain booleans
+        return column.fillna('').astype('string[pyarrow]')
+    
+    @staticmethod
+    def _decode_stop_names(names: pd.Series) -> pd.Series:
+        """Decode URL-encoded stop names, one column-wide pass per step"""
         # Replace %20% with space (custom encoding in your data)
-        name = str(name).replace('%20%', ' ')
+        names = names.fillna('').astype(str).str.replace('%20%', ' ', regex=False)
         # Standard URL decode
-        name = unquote(name)
+        decoded = _unquote_array(names.to_numpy(dtype=object))
         # Clean up extra spaces
-        name = ' '.join(name.split())
-        return name.strip()
+        return pd.Series(decoded, index=names.index, dtype=object).str.split().str.join(' ').str.strip()
+    
+    def _build_stop_arrays(self, stops_df: pd.DataFrame):
+        """Extract stop records, search names and radian coordinates"""
+        # Plain Python records, so results serialize without numpy scalars
+        self._stop_records = stops_df[
+            ['stop_id', 'stop_name', 'latitude', 'longitude']
+        ].to_dict('records')
+        
+        # Lowercase names for substring search, positionally aligned with the records
+        self._stop_names_lower = self._arrow_strings(
+            stops_df['stop_name'].str.lower().reset_index(drop=True)
+        )
+        
+        lat = stops_df['latitude'].to_numpy(dtype=float)
+        lng = stops_df['longitude'].to_numpy(dtype=float)
+        # Rows with missing coordinates can never be nearest
+        self._stop_coord_rows = np.flatnonzero(~(np.isnan(lat) | np.isnan(lng)))
+        self._stop_lat_rad = np.radians(lat[self._stop_coord_rows])
+        self._stop_lng_rad = np.radians(lng[self._stop_coord_rows])
+        self._stop_cos_lat = np.cos(self._stop_lat_rad)
+        
+        # Unit-sphere points: chord length orders stops exactly like
+        # great-circle distance, so the KD-tree nearest is the haversine nearest
+        self._stop_tree = None
+        if len(self._stop_coord_rows):
+            self._stop_tree = cKDTree(np.column_stack((
+                self._stop_cos_lat * np.cos(self._stop_lng_rad),
+                self._stop_cos_lat * np.sin(self._stop_lng_rad),
+                np.sin(self._stop_lat_rad),
+            )))
     
     def _build_stop_name_mapping(self):
         """Build mapping between stop IDs and real names from chennai_bus_stops.csv"""
@@ -96,76 +256,218 @@ class DataLoader:
         
         # First, use chennai_bus_stops.csv for real names
         if self.bus_stops_df is not None:
-            for _, row in self.bus_stops_df.iterrows():
-                stop_id = str(row['stop_id'])
-                stop_name = str(row['stop_name']).strip()
+            df = self.bus_stops_df
+            columns = (
+                df['stop_id'].astype(str),
+                df['stop_name'].astype(str).str.strip(),
+                df['latitude'],
+                df['longitude'],
+            )
+            for stop_id, stop_name, lat, lng in zip(*(c.tolist() for c in columns)):
                 if stop_name and stop_name != 'nan':
                     self.stop_id_to_name[stop_id] = stop_name
                     self.stop_name_to_id[stop_name.lower()] = stop_id
-                    if pd.notna(row['latitude']) and pd.notna(row['longitude']):
+                    # NaN never equals itself, so this skips missing coordinates
+                    if lat == lat and lng == lng:
                         self.stop_id_to_coords[stop_id] = {
-                            'lat': row['latitude'],
-                            'lng': row['longitude']
+                            'lat': lat,
+                            'lng': lng
                         }
         
         print(f"   - Built stop name mapping: {len(self.stop_id_to_name)} real names")
     
+    def _build_edge_index(self):
+        """Build per-route edge distance lookup from route edges"""
+        self._edges_by_route = {}  # route -> {(from_id, to_id): distance_km}
+        
+        # Pull plain Python columns once instead of boxing every row
+        edges = self.route_edges_df
+        routes = edges['route_number'].astype(str).tolist()
+        from_ids = edges['from_stop'].astype(str).tolist()
+        to_ids = edges['to_stop'].astype(str).tolist()
+        distances = edges['distance_km'].tolist()
+        
+        for route, from_id, to_id, distance in zip(routes, from_ids, to_ids, distances):
+            # First occurrence wins
+            self._edges_by_route.setdefault(route, {}).setdefault((from_id, to_id), distance)
+    
+    def _narrow_edge_table(self):
+        """
+        Shrink route_edges_df once the exact distances are indexed: float32
+        distances, and from/to stop IDs dictionary-encoded over one shared
+        category set
+        """
+        edges = self.route_edges_df
+        stop_ids = pd.unique(np.concatenate((edges['from_stop'].to_numpy(), edges['to_stop'].to_numpy())))
+        self._code_to_stop_id = np.sort(stop_ids)  # code -> stop ID
+        for column in ('from_stop', 'to_stop'):
+            edges[column] = pd.Categorical(edges[column], categories=self._code_to_stop_id)
+        edges['distance_km'] = edges['distance_km'].astype(np.float32)
+    
+    @property
+    def graph(self) -> Dict:
+        """Adjacency graph from route edges, built on first access"""
+        if self._graph is None:
+            self._build_graph()
+        return self._graph
+    
+    @property
+    def route_graph(self) -> Dict:
+        """Route-specific adjacency graphs, built on first access"""
+        if self._route_graph is None:
+            self._build_graph()
+        return self._route_graph
+    
     def _build_graph(self):
         """Build adjacency graph from route edges"""
-        for _, row in self.route_edges_df.iterrows():
-            route = str(row['route_number'])
-            from_stop = row['from_stop']
-            to_stop = row['to_stop']
-            distance = row['distance_km']
-            
+        graph = defaultdict(list)
+        route_graph = defaultdict(dict)
+        
+        edges = self.route_edges_df
+        routes = edges['route_number'].astype(str).tolist()
+        # Decode the category codes so the graphs stay keyed by stop ID
+        from_stops = self._code_to_stop_id[edges['from_stop'].cat.codes.to_numpy()].tolist()
+        to_stops = self._code_to_stop_id[edges['to_stop'].cat.codes.to_numpy()].tolist()
+        distances = edges['distance_km'].tolist()
+        
+        for route, from_stop, to_stop, distance in zip(routes, from_stops, to_stops, distances):
             # Add edge to graph
-            self.graph[from_stop].append({
+            graph[from_stop].append({
                 'to_stop': to_stop,
                 'route': route,
                 'distance': distance
             })
             
             # Build route-specific graph
-            if route not in self.route_graph:
-                self.route_graph[route] = defaultdict(list)
-            self.route_graph[route][from_stop].append({
+            if route not in route_graph:
+                route_graph[route] = defaultdict(list)
+            route_graph[route][from_stop].append({
                 'to_stop': to_stop,
                 'distance': distance
             })
+        
+        # Publish both together; a concurrent first access just builds twice
+        self._graph, self._route_graph = graph, route_graph
     
     def _build_route_index(self):
         """Build index for quick route lookups"""
         self.stop_to_routes = defaultdict(set)
         self.route_stops_index = defaultdict(list)
         
-        for _, row in self.route_stops_df.iterrows():
-            route = str(row['route_number'])
-            
-            # Get the stop_id and stop_name directly from route_stop_ordered.csv
-            stop_id = str(row['stop_id']).strip()
-            
+        # Order rows once up front: routes by first appearance in the file,
+        # stops by sequence within each route (lexsort is stable, so equal
+        # sequences keep file order) - no per-route sort afterwards
+        df = self.route_stops_df
+        route_codes, _ = pd.factorize(df['route_number'].astype(str))
+        df = df.iloc[np.lexsort((df['stop_sequence'].to_numpy(), route_codes))]
+        if 'stop_name' in df.columns:
+            names = df['stop_name'].astype(str).str.strip()
+        else:
+            names = pd.Series('', index=df.index)
+        columns = (
+            df['route_number'].astype(str),
+            df['stop_id'].astype(str).str.strip(),
+            names,
+            df['stop_sequence'],
+            df['latitude'],
+            df['longitude'],
+        )
+        
+        for route, stop_id, stop_name, sequence, latitude, longitude in zip(*(c.tolist() for c in columns)):
             # Use stop_name from the CSV (which has been cleaned by clean_data.py)
-            stop_name = str(row.get('stop_name', '')).strip()
             if not stop_name or stop_name == 'nan':
                 stop_name = self.stop_id_to_name.get(stop_id, f"Stop_{stop_id}")
             
-            sequence = row['stop_sequence']
-            
-            # Index by stop name (lowercase) for route lookups
-            self.stop_to_routes[stop_name.lower()].add(route)
+            # Index by stop name (lowercase) for route lookups; interned so
+            # every index keyed by it shares one string object per name
+            stop_name_lower = sys.intern(stop_name.lower())
+            self.stop_to_routes[stop_name_lower].add(route)
             self.stop_to_routes[stop_id].add(route)
             
             self.route_stops_index[route].append({
                 'stop_id': stop_id,
                 'stop_name': stop_name,
+                'stop_name_lower': stop_name_lower,  # Precomputed for matching
                 'sequence': sequence,
-                'latitude': row['latitude'],
-                'longitude': row['longitude']
+                'latitude': latitude,
+                'longitude': longitude
             })
         
-        # Sort by sequence
-        for route in self.route_stops_index:
-            self.route_stops_index[route].sort(key=lambda x: x['sequence'])
+        # Per-route sequence lookups: exact name -> first sequence, and the
+        # sorted sequence list for bisecting to "stops after X"
+        self.route_stop_seq = {}
+        self.route_sequences = {}
+        self.route_stops_view = {}
+        self._route_map_paths = {}  # route -> (path, markers) for get_route_coordinates
+        self._route_rank = {}  # route -> position in route_stops_index order
+        self.route_columns = {}  # route -> column arrays, one entry per stop in order
+        self._route_last_seq = {}  # route -> {stop_name_lower: last sequence}
+        self._route_cumdist = {}  # route -> distance from the first stop to each stop
+        self._route_name_to_seq = {}  # route -> {stop_name_lower: get_stop_sequence_in_route answer}
+        self._name_to_route_positions = defaultdict(list)  # stop_name_lower -> [(route, idx)]
+        for route, stops in self.route_stops_index.items():
+            self.route_stops_view[route] = tuple(stops)
+            self._route_rank[route] = len(self._route_rank)
+            self.route_columns[route] = {
+                'stop_id': np.array([stop['stop_id'] for stop in stops], dtype=str),
+                'stop_name_lower': np.array([stop['stop_name_lower'] for stop in stops], dtype=str),
+                'sequence': np.array([stop['sequence'] for stop in stops], dtype=np.int32),
+                'latitude': np.array([stop['latitude'] for stop in stops], dtype=np.float64),
+                'longitude': np.array([stop['longitude'] for stop in stops], dtype=np.float64),
+            }
+            self._route_last_seq[route] = {stop['stop_name_lower']: stop['sequence'] for stop in stops}
+            
+            # Segment lengths between consecutive stops (~1km when no edge is
+            # recorded), accumulated so any span is one subtraction
+            route_edges = self._edges_by_route.get(route, {})
+            stop_ids = self.route_columns[route]['stop_id'].tolist()
+            segments = [route_edges.get(pair, 1.0) for pair in zip(stop_ids, stop_ids[1:])]
+            self._route_cumdist[route] = np.concatenate(([0.0], np.cumsum(segments)))
+            for idx, stop in enumerate(stops):
+                self._name_to_route_positions[stop['stop_name_lower']].append((route, idx))
+            self._route_map_paths[route] = (
+                [{"lat": stop['latitude'], "lng": stop['longitude']} for stop in stops],
+                [
+                    {
+                        "position": {"lat": stop['latitude'], "lng": stop['longitude']},
+                        "title": stop['stop_name'],
+                        "sequence": stop['sequence']
+                    }
+                    for stop in stops
+                ]
+            )
+            name_to_seq = {}
+            for stop in stops:
+                name_to_seq.setdefault(stop['stop_name_lower'], stop['sequence'])
+            self.route_stop_seq[route] = name_to_seq
+            
+            # A route's own names still resolve to the first fuzzy match, which
+            # is often an earlier stop (e.g. 't nagar' before 't nagar bus stand')
+            self._route_name_to_seq[route] = {
+                name: next(
+                    stop['sequence'] for stop in stops
+                    if name in stop['stop_name_lower'] or stop['stop_name_lower'] in name
+                )
+                for name in name_to_seq
+            }
+            self.route_sequences[route] = [stop['sequence'] for stop in stops]
+        
+        # Sorted listings served as-is by /list-all-stops and /list-all-routes
+        self.sorted_stop_keys = tuple(sorted(self.stop_to_routes))
+        self.sorted_routes = tuple(sorted(self.route_stops_index))
+        
+        # Partial-name lookups over every indexed stop key
+        self.stop_matcher = SubstringMatcher(self.stop_to_routes)
+        
+        # Fallback lookups by normalized name and by road (text before the
+        # first comma), each merging the routes of every key that maps to it
+        self._normalized_stop_routes = defaultdict(set)
+        self._road_stop_routes = defaultdict(set)
+        for key, routes in self.stop_to_routes.items():
+            key_norm = normalize_stop_name(key)
+            self._normalized_stop_routes[key_norm].update(routes)
+            self._road_stop_routes[key_norm.split(',')[0].strip()].update(routes)
+        self._normalized_stop_matcher = SubstringMatcher(self._normalized_stop_routes)
         
         # Debug: Print sample of stop names
         all_names = list(set(
@@ -174,21 +476,85 @@ class DataLoader:
         print(f"   - Total routes indexed: {len(self.route_stops_index)}")
         print(f"   - Sample stop names: {all_names[:5]}")
     
+    def _build_stop_trie(self):
+        """Build prefix trie over route stop names for autocomplete"""
+        self.stop_trie = StopTrie()
+        self._stop_by_name_lower = {}
+        
+        for route_stops in self.route_stops_index.values():
+            for stop in route_stops:
+                stop_name_lower = stop['stop_name_lower']
+                if stop_name_lower not in self._stop_by_name_lower:
+                    self._stop_by_name_lower[stop_name_lower] = stop
+                    self.stop_trie.insert_words(stop_name_lower, stop_name_lower)
+        
+        # Mid-word matches the trie can't answer, in the same name order
+        self._stop_name_matcher = SubstringMatcher(self._stop_by_name_lower)
+        
+        # Fallback rows for all-stops hits, resolved once instead of per query
+        self._stop_fallback_rows = []
+        for record in self._stop_records:
+            stop_id = str(record['stop_id'])
+            stop_name = self.stop_id_to_name.get(stop_id, record['stop_name'])
+            stop_name_lower = stop_name.lower()
+            routes = list(self.stop_to_routes.get(stop_name_lower, set()))
+            if not routes:
+                routes = list(self.stop_to_routes.get(stop_id, set()))
+            self._stop_fallback_rows.append((stop_name_lower, {
+                'stop_id': stop_id,
+                'stop_name': stop_name,
+                'latitude': record['latitude'],
+                'longitude': record['longitude'],
+                'routes': routes[:5]
+            }))
+        
+        print(f"   - Built stop trie: {len(self._stop_by_name_lower)} names")
+    
+    def _build_all_stops_with_routes(self):
+        """Build the static all-stops-with-routes payload for client-side filtering"""
+        stops_by_key = {}  # stop_name_lower -> entry
+        
+        for route_num, route_stops in self.route_stops_index.items():
+            for stop in route_stops:
+                stop_key = stop['stop_name_lower']
+                entry = stops_by_key.get(stop_key)
+                if entry is None:
+                    stops_by_key[stop_key] = {
+                        'stop_id': stop['stop_id'],
+                        'stop_name': stop['stop_name'],
+                        'latitude': float(stop['latitude']),
+                        'longitude': float(stop['longitude']),
+                        'routes': [route_num]
+                    }
+                elif route_num not in entry['routes']:
+                    entry['routes'].append(route_num)
+        
+        # Sort by number of routes (important stops first)
+        stops = sorted(stops_by_key.values(), key=lambda x: -len(x['routes']))
+        
+        self.all_stops_with_routes = {
+            "total": len(stops),
+            "stops": stops
+        }
+    
     def is_loaded(self) -> bool:
         """Check if data is loaded"""
         return self._loaded
     
     def get_stops(self, query: str = None) -> List[Dict]:
-        """Get all stops or filter by query"""
+        """
+        Get all stops or filter by query
+        Returns the shared stop records (no copy), callers must not mutate them
+        """
         if query:
-            query_lower = query.lower()
-            filtered = self.stops_df[
-                self.stops_df['stop_name_lower'].str.contains(query_lower, na=False)
-            ]
-        else:
-            filtered = self.stops_df
+            return [self._stop_records[row] for row in self._stop_rows_containing(query.lower())]
         
-        return filtered[['stop_id', 'stop_name', 'latitude', 'longitude']].to_dict('records')
+        return list(self._stop_records)
+    
+    def _stop_rows_containing(self, name_lower: str) -> np.ndarray:
+        """Positions of stops whose lowercase name contains name_lower"""
+        hits = self._stop_names_lower.str.contains(name_lower, regex=False, na=False)
+        return np.flatnonzero(hits.to_numpy())
     
     def get_stop_suggestions(self, query: str, limit: int = 10) -> List[Dict]:
         """Get autocomplete suggestions for stop names with routes"""
@@ -196,54 +562,37 @@ class DataLoader:
         suggestions = []
         seen_names = set()
         
-        # Primary source: search in route_stops_index (cleaned names)
-        for route_num, route_stops in self.route_stops_index.items():
-            for stop in route_stops:
-                stop_name = stop['stop_name']
-                stop_name_lower = stop_name.lower()
-                
-                if query_lower in stop_name_lower and stop_name_lower not in seen_names:
-                    # Collect all routes for this stop
-                    routes = list(self.stop_to_routes.get(stop_name_lower, set()))
-                    
-                    seen_names.add(stop_name_lower)
-                    suggestions.append({
-                        'stop_id': stop['stop_id'],
-                        'stop_name': stop_name,
-                        'latitude': stop['latitude'],
-                        'longitude': stop['longitude'],
-                        'routes': routes[:5]
-                    })
-                    
+        def add_suggestion(stop, stop_name_lower):
+            routes = list(self.stop_to_routes.get(stop_name_lower, set()))
+            seen_names.add(stop_name_lower)
+            suggestions.append({
+                'stop_id': stop['stop_id'],
+                'stop_name': stop['stop_name'],
+                'latitude': stop['latitude'],
+                'longitude': stop['longitude'],
+                'routes': routes[:5]
+            })
+        
+        # Primary source: prefix trie over route stop names (word starts)
+        for stop_name_lower in self.stop_trie.starts_with(query_lower, limit):
+            add_suggestion(self._stop_by_name_lower[stop_name_lower], stop_name_lower)
+        
+        # Mid-word matches are not in the trie, probe the substring index
+        if len(suggestions) < limit:
+            for stop_name_lower in self._stop_name_matcher.containing(query_lower):
+                if stop_name_lower not in seen_names:
+                    add_suggestion(self._stop_by_name_lower[stop_name_lower], stop_name_lower)
                     if len(suggestions) >= limit:
                         break
-            if len(suggestions) >= limit:
-                break
-        
-        # Fallback: also search in stops_df if not enough
-        if len(suggestions) < limit and self.stops_df is not None:
-            filtered = self.stops_df[
-                self.stops_df['stop_name_lower'].str.contains(query_lower, na=False)
-            ]
-            
-            for _, row in filtered.iterrows():
-                stop_id = str(row['stop_id'])
-                stop_name = self.stop_id_to_name.get(stop_id, row['stop_name'])
-                stop_name_lower = stop_name.lower()
+        
+        # Fallback: also search all stops if not enough
+        if len(suggestions) < limit:
+            for row in self._stop_rows_containing(query_lower):
+                stop_name_lower, suggestion = self._stop_fallback_rows[row]
                 
                 if stop_name_lower not in seen_names:
-                    routes = list(self.stop_to_routes.get(stop_name_lower, set()))
-                    if not routes:
-                        routes = list(self.stop_to_routes.get(stop_id, set()))
-                    
                     seen_names.add(stop_name_lower)
-                    suggestions.append({
-                        'stop_id': stop_id,
-                        'stop_name': stop_name,
-                        'latitude': row['latitude'],
-                        'longitude': row['longitude'],
-                        'routes': routes[:5]
-                    })
+                    suggestions.append({**suggestion, 'routes': list(suggestion['routes'])})
                     
                     if len(suggestions) >= limit:
                         break
@@ -253,133 +602,112 @@ class DataLoader:
         
         return suggestions[:limit]
     
-    def get_routes_for_stop(self, stop_name: str) -> set:
-        """Get all routes passing through a stop"""
-        import re
-        stop_lower = stop_name.lower().strip()
-        
+    def get_routes_for_stop(self, stop_name: str) -> frozenset:
+        """Get all routes passing through a stop (memoized per data load)"""
+        return self._routes_for_stop_cached(stop_name.lower().strip())
+    
+    def _routes_for_stop(self, stop_lower: str) -> frozenset:
+        """Uncached route lookup behind get_routes_for_stop"""
         # Try exact match first
         if stop_lower in self.stop_to_routes:
-            return self.stop_to_routes[stop_lower]
+            return frozenset(self.stop_to_routes[stop_lower])
         
-        # Try partial match - search in all keys
-        for key, routes in self.stop_to_routes.items():
-            if stop_lower in key or key in stop_lower:
-                return routes
+        # Try partial match - first key containing, or contained in, the query
+        key = self.stop_matcher.first_related(stop_lower)
+        if key is not None:
+            return frozenset(self.stop_to_routes[key])
         
         # Try normalized match (strip coordinate suffixes)
-        def normalize(name):
-            name = name.lower().strip()
-            name = re.sub(r'\s*\([\d.]+n\)', '', name)
-            name = re.sub(r'\s*\(route\s+\w+\)', '', name)
-            name = re.sub(r'\s*#\d+', '', name)
-            return name.strip()
-        
-        stop_norm = normalize(stop_lower)
+        stop_norm = normalize_stop_name(stop_lower)
         all_routes = set()
-        for key, routes in self.stop_to_routes.items():
-            key_norm = normalize(key)
-            if stop_norm == key_norm or stop_norm in key_norm or key_norm in stop_norm:
-                all_routes.update(routes)
+        for key_norm in self._normalized_stop_matcher.related(stop_norm):
+            all_routes.update(self._normalized_stop_routes[key_norm])
         
         if all_routes:
-            return all_routes
+            return frozenset(all_routes)
         
         # Try road name match (first part before comma)
         stop_road = stop_norm.split(',')[0].strip()
         if len(stop_road) > 5:
-            for key, routes in self.stop_to_routes.items():
-                key_road = normalize(key).split(',')[0].strip()
-                if stop_road == key_road:
-                    all_routes.update(routes)
+            all_routes.update(self._road_stop_routes.get(stop_road, ()))
         
-        return all_routes
+        return frozenset(all_routes)
     
     def get_route_stops(self, route_number: str) -> List[Dict]:
-        """Get all stops for a route in order"""
+        """
+        Get all stops for a route in order
+        Returns the shared index list (no copy), callers must not mutate it
+        """
         return self.route_stops_index.get(str(route_number), [])
     
+    def get_route_stops_view(self, route_number: str) -> tuple:
+        """Read-only tuple of a route's stops for hot iteration loops"""
+        return self.route_stops_view.get(str(route_number), ())
+    
     def get_route_coordinates(self, route_number: str) -> Dict:
         """Get all coordinates for a route for map visualization"""
-        stops = self.get_route_stops(route_number)
-        if not stops:
+        paths = self._route_map_paths.get(str(route_number))
+        if not paths:
             return None
         
-        coordinates = [
-            {"lat": stop['latitude'], "lng": stop['longitude']}
-            for stop in stops
-        ]
-        
-        markers = [
-            {
-                "position": {"lat": stop['latitude'], "lng": stop['longitude']},
-                "title": stop['stop_name'],
-                "sequence": stop['sequence']
-            }
-            for stop in stops
-        ]
+        # Built once per route at load; shared, callers must not mutate them
+        coordinates, markers = paths
         
         return {
             "route_number": route_number,
             "path": coordinates,
             "markers": markers,
-            "total_stops": len(stops)
+            "total_stops": len(coordinates)
         }
     
     def get_stop_sequence_in_route(self, route_number: str, stop_name: str) -> Optional[int]:
         """Get the sequence number of a stop in a route"""
-        stops = self.get_route_stops(str(route_number))
+        columns = self.route_columns.get(str(route_number))
+        if columns is None:
+            return None
         stop_name_lower = stop_name.lower().strip()
         
-        for stop in stops:
-            sn = stop['stop_name'].lower()
-            if sn == stop_name_lower or stop_name_lower in sn or sn in stop_name_lower:
-                return stop['sequence']
-        
-        return None
+        # Names on the route are answered from the precomputed map
+        sequence = self._route_name_to_seq[str(route_number)].get(stop_name_lower)
+        if sequence is not None:
+            return sequence
+        
+        # Equal, contains, or contained in - one vectorized pass per test
+        names = columns['stop_name_lower']
+        matches = (
+            (names == stop_name_lower)
+            | (np.char.find(names, stop_name_lower) >= 0)
+            | (np.char.find(stop_name_lower, names) >= 0)
+        )
+        
+        hits = np.flatnonzero(matches)
+        return int(columns['sequence'][hits[0]]) if len(hits) else None
     
     def get_distance_between_stops(self, route_number: str, from_stop: str, to_stop: str) -> float:
         """Calculate total distance between two stops on a route"""
-        stops = self.route_stops_index.get(str(route_number), [])
-        from_seq = None
-        to_seq = None
-        
-        from_stop_lower = from_stop.lower()
-        to_stop_lower = to_stop.lower()
-        
-        for stop in stops:
-            if stop['stop_name'].lower() == from_stop_lower:
-                from_seq = stop['sequence']
-            if stop['stop_name'].lower() == to_stop_lower:
-                to_seq = stop['sequence']
+        # Last sequence per exact name, as the old overwrite-in-a-loop scan gave
+        stops_in_route = self._route_last_seq.get(str(route_number), {})
+        from_seq = stops_in_route.get(from_stop.lower())
+        to_seq = stops_in_route.get(to_stop.lower())
         
         if from_seq is None or to_seq is None:
             return 0.0
         
-        # Get edges for this route
-        route_edges = self.route_edges_df[
-            self.route_edges_df['route_number'].astype(str) == str(route_number)
-        ]
-        
         total_distance = 0.0
-        stops_in_route = {s['stop_name'].lower(): s['sequence'] for s in stops}
         
-        for _, edge in route_edges.iterrows():
-            edge_from = edge['from_stop'].lower() if isinstance(edge['from_stop'], str) else str(edge['from_stop'])
-            edge_to = edge['to_stop'].lower() if isinstance(edge['to_stop'], str) else str(edge['to_stop'])
-            
-            from_edge_seq = stops_in_route.get(edge_from)
-            to_edge_seq = stops_in_route.get(edge_to)
+        for (edge_from, edge_to), distance in self._edges_by_route.get(str(route_number), {}).items():
+            from_edge_seq = stops_in_route.get(edge_from.lower())
+            to_edge_seq = stops_in_route.get(edge_to.lower())
             
             if from_edge_seq and to_edge_seq:
                 if from_seq <= from_edge_seq < to_seq:
-                    total_distance += edge['distance_km']
+                    total_distance += distance
         
         return round(total_distance, 2)
     
     def get_total_stops(self) -> int:
         """Get total number of unique stops"""
-        return len(self.stops_df) if self.stops_df is not None else 0
+        return len(self._stop_records)
     
     def get_total_routes(self) -> int:
         """Get total number of routes"""
@@ -391,73 +719,68 @@ class DataLoader:
     
     def find_nearest_stop(self, lat: float, lon: float) -> Dict:
         """Find nearest stop to given coordinates"""
-        from math import radians, cos, sin, sqrt, atan2
-        
-        def haversine(lat1, lon1, lat2, lon2):
-            R = 6371  # Earth's radius in km
-            lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
-            a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-            c = 2 * atan2(sqrt(a), sqrt(1-a))
-            return R * c
-        
-        min_dist = float('inf')
-        nearest_stop = None
-        
-        for _, row in self.stops_df.iterrows():
-            dist = haversine(lat, lon, row['latitude'], row['longitude'])
-            if dist < min_dist:
-                min_dist = dist
-                nearest_stop = {
-                    'stop_id': row['stop_id'],
-                    'stop_name': row['stop_name'],
-                    'latitude': row['latitude'],
-                    'longitude': row['longitude'],
-                    'distance_km': round(dist, 3)
-                }
-        
-        return nearest_stop
+        from math import radians, cos, sin
+        
+        if self._stop_tree is None:
+            return None
+        
+        lat1, lon1 = radians(lat), radians(lon)
+        point = (cos(lat1) * cos(lon1), cos(lat1) * sin(lon1), sin(lat1))
+        chord, _ = self._stop_tree.query(point)
+        if not np.isfinite(chord):
+            return None
+        
+        # Re-rank everything at the nearest chord length (plus rounding slack)
+        # by haversine, so ties still go to the first stop in file order
+        rows = np.sort(self._stop_tree.query_ball_point(point, chord * (1 + 1e-9) + 1e-12))
+        
+        R = 6371  # Earth's radius in km
+        dlat = self._stop_lat_rad[rows] - lat1
+        dlon = self._stop_lng_rad[rows] - lon1
+        a = np.sin(dlat / 2) ** 2 + cos(lat1) * self._stop_cos_lat[rows] * np.sin(dlon / 2) ** 2
+        dist = 2 * R * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        
+        best = int(np.argmin(dist))
+        nearest = self._stop_records[self._stop_coord_rows[rows[best]]]
+        
+        # Build the result once, for the winner only
+        return {**nearest, 'distance_km': round(float(dist[best]), 3)}
     
     def find_stop_by_name(self, name: str) -> Optional[Dict]:
-        """Find a stop by name with fuzzy matching"""
-        name_lower = name.lower().strip()
-        
-        # Search in stops_df
-        if self.stops_df is not None:
-            # Exact match first
-            exact = self.stops_df[self.stops_df['stop_name_lower'] == name_lower]
-            if not exact.empty:
-                row = exact.iloc[0]
-                return {
-                    'stop_id': str(row['stop_id']),
-                    'stop_name': row['stop_name'],
-                    'latitude': row['latitude'],
-                    'longitude': row['longitude']
-                }
-            
-            # Partial match
-            partial = self.stops_df[self.stops_df['stop_name_lower'].str.contains(name_lower, na=False)]
-            if not partial.empty:
-                row = partial.iloc[0]
-                return {
-                    'stop_id': str(row['stop_id']),
-                    'stop_name': row['stop_name'],
-                    'latitude': row['latitude'],
-                    'longitude': row['longitude']
-                }
-        
-        # Also search in route_stops_index
-        for route, stops in self.route_stops_index.items():
-            for stop in stops:
-                stop_name_lower = stop['stop_name'].lower()
-                if name_lower == stop_name_lower or name_lower in stop_name_lower or stop_name_lower in name_lower:
-                    return {
-                        'stop_id': str(stop['stop_id']),
-                        'stop_name': stop['stop_name'],
-                        'latitude': stop['latitude'],
-                        'longitude': stop['longitude']
-                    }
+        """Find a stop by name with fuzzy matching (memoized per data load)"""
+        stop = self._stop_by_name_cached(name.lower().strip())
+        # Copy so callers can't alter the memoized entry
+        return dict(stop) if stop else None
+    
+    def _find_stop_by_name(self, name_lower: str) -> Optional[Dict]:
+        """Uncached stop lookup behind find_stop_by_name"""
+        # Search all stops: exact match first, then partial match
+        rows = np.flatnonzero((self._stop_names_lower == name_lower).to_numpy())
+        if not len(rows):
+            rows = self._stop_rows_containing(name_lower)
+        if len(rows):
+            record = self._stop_records[rows[0]]
+            return {**record, 'stop_id': str(record['stop_id'])}
+        
+        # Also search route stops: the earliest (route order, then stop
+        # order) whose name equals, contains, or is contained in the query
+        first = None
+        for key in self.stop_matcher.related(name_lower):
+            positions = self._name_to_route_positions.get(key)
+            if positions:
+                route, idx = positions[0]
+                rank = (self._route_rank[route], idx)
+                if first is None or rank < first[0]:
+                    first = (rank, route, idx)
+        
+        if first is not None:
+            stop = self.route_stops_index[first[1]][first[2]]
+            return {
+                'stop_id': str(stop['stop_id']),
+                'stop_name': stop['stop_name'],
+                'latitude': stop['latitude'],
+                'longitude': stop['longitude']
+            }
         
         return None
 
@@ -475,42 +798,27 @@ class DataLoader:
         
         print(f"🔍 Finding routes from '{from_stop_name}' to '{to_stop_name}'")
         
-        # Search through all routes
-        for route_num, route_stops in self.route_stops_index.items():
-            from_idx = None
-            to_idx = None
-            from_stop_data = None
-            to_stop_data = None
+        # Earliest position per route of any stop name matching each end
+        from_first = self._first_positions(from_stop_lower)
+        to_first = self._first_positions(to_stop_lower)
+        
+        # Walk shared routes in index order so equal stop counts keep it
+        shared = sorted(from_first.keys() & to_first.keys(), key=self._route_rank.__getitem__)
+        for route_num in shared:
+            from_idx = from_first[route_num]
+            to_idx = to_first[route_num]
             
-            # Find both stops in this route
-            for idx, stop in enumerate(route_stops):
-                stop_name_lower = stop['stop_name'].lower()
-                
-                # Check for from_stop (fuzzy match)
-                if from_idx is None:
-                    if (from_stop_lower == stop_name_lower or 
-                        from_stop_lower in stop_name_lower or 
-                        stop_name_lower in from_stop_lower):
-                        from_idx = idx
-                        from_stop_data = stop
+            # Destination must come after source
+            if to_idx > from_idx:
+                route_stops = self.route_stops_index[route_num]
                 
-                # Check for to_stop (fuzzy match)
-                if to_idx is None:
-                    if (to_stop_lower == stop_name_lower or 
-                        to_stop_lower in stop_name_lower or 
-                        stop_name_lower in to_stop_lower):
-                        to_idx = idx
-                        to_stop_data = stop
-            
-            # If both stops found and destination is after source
-            if from_idx is not None and to_idx is not None and to_idx > from_idx:
                 # Calculate distance
                 distance = self._calculate_route_distance(route_num, from_idx, to_idx)
                 
                 routes.append({
                     'route_number': route_num,
-                    'from_stop': from_stop_data,
-                    'to_stop': to_stop_data,
+                    'from_stop': route_stops[from_idx],
+                    'to_stop': route_stops[to_idx],
                     'from_sequence': from_idx + 1,
                     'to_sequence': to_idx + 1,
                     'stops_count': to_idx - from_idx,
@@ -525,36 +833,46 @@ class DataLoader:
         
         return routes
     
+    def _first_positions(self, name_lower: str) -> Dict[str, int]:
+        """
+        route -> first stop index whose name equals, contains, or is
+        contained in name_lower, from the name postings lists
+        """
+        first = {}
+        for key in self.stop_matcher.related(name_lower):
+            for route, idx in self._name_to_route_positions.get(key, ()):
+                if idx < first.get(route, idx + 1):
+                    first[route] = idx
+        return first
+    
+    def _last_positions(self, name_lower: str) -> Dict[str, int]:
+        """route -> last stop index matching name_lower, as _first_positions"""
+        last = {}
+        for key in self.stop_matcher.related(name_lower):
+            for route, idx in self._name_to_route_positions.get(key, ()):
+                if idx > last.get(route, -1):
+                    last[route] = idx
+        return last
+    
+    def routes_in_travel_order(self, from_stop_name: str, to_stop_name: str, routes) -> List[str]:
+        """
+        The given routes that actually run from -> to: some stop matching
+        to_stop_name comes after the first stop matching from_stop_name
+        """
+        from_first = self._first_positions(from_stop_name.lower().strip())
+        to_last = self._last_positions(to_stop_name.lower().strip())
+        return [
+            route for route in routes
+            if route in from_first and to_last.get(route, -1) > from_first[route]
+        ]
+    
     def _calculate_route_distance(self, route_number: str, from_idx: int, to_idx: int) -> float:
         """Calculate distance between two stops on a route"""
-        route_stops = self.route_stops_index.get(str(route_number), [])
+        cumdist = self._route_cumdist.get(str(route_number))
         
-        if not route_stops or from_idx >= len(route_stops) or to_idx >= len(route_stops):
+        if cumdist is None or from_idx >= len(cumdist) or to_idx >= len(cumdist):
+            return 0.0
+        if to_idx <= from_idx:
             return 0.0
         
-        # Get stop IDs for the segment
-        stop_ids = [str(route_stops[i]['stop_id']) for i in range(from_idx, to_idx + 1)]
-        
-        # Sum up distances from route_edges
-        total_distance = 0.0
-        route_edges = self.route_edges_df[
-            self.route_edges_df['route_number'].astype(str) == str(route_number)
-        ]
-        
-        for i in range(len(stop_ids) - 1):
-            from_id = stop_ids[i]
-            to_id = stop_ids[i + 1]
-            
-            # Find edge
-            edge = route_edges[
-                (route_edges['from_stop'].astype(str) == from_id) &
-                (route_edges['to_stop'].astype(str) == to_id)
-            ]
-            
-            if not edge.empty:
-                total_distance += edge['distance_km'].iloc[0]
-            else:
-                # Estimate ~1km per stop if edge not found
-                total_distance += 1.0
-        
-        return round(total_distance, 2)
+        return round(float(cumdist[to_idx] - cumdist[from_idx]), 2)
@@ -5,16 +5,114 @@ Uses ticket machine timestamps to track bus locations and predict arrival times
 
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import GradientBoostingRegressor
-from sklearn.preprocessing import StandardScaler
+from sklearn import config_context
+from sklearn.ensemble import HistGradientBoostingRegressor
 from datetime import datetime, timedelta
 import pickle
 import os
+import time
 from typing import Dict, List, Optional
 from collections import defaultdict
-import random
 import requests
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the movement tick falls back to NumPy
+    njit = None
+
+# Delay status thresholds (minutes), see _get_delay_status
+DELAY_STATUS_BINS = np.array([-1, 2, 5, 10])
+DELAY_STATUS_LABELS = np.array(
+    ["Early", "On Time", "Slightly Delayed", "Delayed", "Heavily Delayed"], dtype=object
+)
+
+# Column types declared up front so read_csv skips inference; the ETA
+# model only needs float32 distances and int32 sequence numbers
+_ROUTE_STOPS_DTYPES = {
+    'route_number': str, 'stop_id': 'int64', 'stop_sequence': 'int32',
+    'stop_name': str, 'latitude': 'float64', 'longitude': 'float64'
+}
+_EDGES_DTYPES = {'route_number': str, 'from_stop': 'int64', 'to_stop': 'int64', 'distance_km': 'float32'}
+
+# Weather impact factor, indexed by position in WEATHER_CONDITIONS
+WEATHER_CONDITIONS = ('clear', 'cloudy', 'rain', 'heavy_rain')
+WEATHER_FACTORS = np.array([1.0, 1.05, 1.3, 1.8])
+_WEATHER_INDEX = {weather: i for i, weather in enumerate(WEATHER_CONDITIONS)}
+
+def _traffic_factor_for(hour: int, is_weekend: bool) -> float:
+    """Traffic factor based on time, tabulated into TRAFFIC_FACTORS below"""
+    if is_weekend:
+        return 1.1
+    
+    if 7 <= hour <= 10:
+        return 1.6  # Morning rush
+    elif 17 <= hour <= 20:
+        return 1.8  # Evening rush (worst)
+    elif 11 <= hour <= 16:
+        return 1.2  # Midday
+    elif 21 <= hour or hour <= 6:
+        return 0.9  # Night
+    return 1.0
+
+# TRAFFIC_FACTORS[is_weekend, hour]
+TRAFFIC_FACTORS = np.array([[_traffic_factor_for(hour, weekend) for hour in range(24)]
+                            for weekend in (False, True)])
+
+TICKET_HISTORY_SIZE = 200_000  # Most recent tickets kept for retraining
+
+# Versioned name so models saved with the old scaler + GradientBoosting
+# pipeline (eta_model.pkl / eta_scaler.pkl) are never fed unscaled features
+ETA_MODEL_FILE = "eta_hgb_model.pkl"
+
+def _expand(counts: np.ndarray):
+    """Group index and position within the group for each of sum(counts) rows"""
+    group = np.repeat(np.arange(len(counts)), counts)
+    return group, np.arange(len(group)) - (np.cumsum(counts) - counts)[group]
+
+def _advance_buses_loop(stop_idx, progress, last_stop, stop_base, stop_lat, stop_lng,
+                        lat, lng, step, moving, arrived):
+    """
+    One movement tick in place: buses short of their final stop advance by
+    step, those reaching 1.0 move onto the next stop, positions are
+    interpolated between stops; moving/arrived are filled per bus
+    """
+    for i in range(stop_idx.shape[0]):
+        moving[i] = stop_idx[i] < last_stop[i]
+        arrived[i] = False
+        if not moving[i]:
+            continue
+        progress[i] += step
+        if progress[i] >= 1.0:
+            stop_idx[i] += 1
+            progress[i] = 0.0
+            arrived[i] = True
+        here = stop_base[i] + stop_idx[i]
+        ahead = stop_base[i] + min(stop_idx[i] + 1, last_stop[i])
+        lat[i] = stop_lat[here] + (stop_lat[ahead] - stop_lat[here]) * progress[i]
+        lng[i] = stop_lng[here] + (stop_lng[ahead] - stop_lng[here]) * progress[i]
+
+
+def _advance_buses_numpy(stop_idx, progress, last_stop, stop_base, stop_lat, stop_lng,
+                         lat, lng, step, moving, arrived):
+    """NumPy version of _advance_buses_loop for when numba is unavailable"""
+    moving[:] = stop_idx < last_stop
+    progress[moving] += step
+    arrived[:] = moving & (progress >= 1.0)
+    stop_idx[arrived] += 1
+    progress[arrived] = 0.0
+    
+    # Arrived buses have progress 0 so they sit exactly on their new stop
+    here = stop_base + stop_idx
+    ahead = stop_base + np.minimum(stop_idx + 1, last_stop)
+    lat1, lon1 = stop_lat[here], stop_lng[here]
+    lat2, lon2 = stop_lat[ahead], stop_lng[ahead]
+    lat[moving] = (lat1 + (lat2 - lat1) * progress)[moving]
+    lng[moving] = (lon1 + (lon2 - lon1) * progress)[moving]
+
+
+# No fastmath: progress must accumulate exactly as repeated float adds
+_advance_buses = njit(cache=True)(_advance_buses_loop) if njit is not None else _advance_buses_numpy
+
 class BusETAPredictor:
     def __init__(self):
         # Dynamically determine the base path (project root)
@@ -25,17 +123,38 @@ class BusETAPredictor:
         
         self.model_path = os.path.join(self.base_path, "backend/models")
         self.eta_model = None
-        self.scaler = StandardScaler()
+        self._rng = np.random.default_rng()
+        
+        # Live bus tracking data (in production, this comes from ticket machines),
+        # one row per bus in the position columns set up by _build_position_table
+        self._bus_rows = {}  # bus_id -> row
+        
+        # Historical ticket timestamps: ring buffer of parallel columns, the
+        # newest TICKET_HISTORY_SIZE tickets are kept
+        self._hist_bus_id = np.empty(TICKET_HISTORY_SIZE, dtype=object)
+        self._hist_stop_id = np.empty(TICKET_HISTORY_SIZE, dtype=object)
+        self._hist_ts = np.empty(TICKET_HISTORY_SIZE, dtype='datetime64[us]')
+        self._hist_delay = np.empty(TICKET_HISTORY_SIZE, dtype=np.float32)
+        self._hist_pos = 0  # tickets recorded so far
         
-        # Live bus tracking data (in production, this comes from ticket machines)
-        self.live_bus_positions = {}  # bus_id -> {route, current_stop, timestamp, direction}
-        self.ticket_history = []  # Historical ticket timestamps
+        # Callbacks fired with (bus_id, position) whenever a bus moves
+        self._position_listeners = []
         
         # Route timing patterns learned from data
         self.route_timing_patterns = defaultdict(dict)
         
+        # Per-route lookups built once from the CSVs, see _build_route_index
+        self._stops_by_route = {}  # route -> stop records in sequence order
+        self._edges_distance_by_route = {}  # route -> total edge length (km)
+        
+        # route -> {stop_name_lower: first index} over the data loader's route
+        # stops, rebuilt whenever the loader reloads (cache_version changes)
+        self._stop_positions = {}
+        self._stop_positions_version = None
+        
         # Weather and traffic factors
         self.current_weather = "clear"  # clear, rain, heavy_rain
+        self._weather_idx = _WEATHER_INDEX[self.current_weather]
         self.current_traffic = "normal"  # light, normal, heavy, very_heavy
         
         self._ready = False
@@ -44,6 +163,8 @@ class BusETAPredictor:
     def _initialize(self):
         """Initialize the ETA prediction system"""
         try:
+            self._load_csvs()
+            
             if not self._load_model():
                 print("⏳ Training ETA prediction model...")
                 self._train_eta_model()
@@ -64,14 +185,11 @@ class BusETAPredictor:
     def _load_model(self) -> bool:
         """Load pre-trained ETA model"""
         try:
-            model_file = os.path.join(self.model_path, "eta_model.pkl")
-            scaler_file = os.path.join(self.model_path, "eta_scaler.pkl")
+            model_file = os.path.join(self.model_path, ETA_MODEL_FILE)
             
-            if os.path.exists(model_file) and os.path.exists(scaler_file):
+            if os.path.exists(model_file):
                 with open(model_file, 'rb') as f:
                     self.eta_model = pickle.load(f)
-                with open(scaler_file, 'rb') as f:
-                    self.scaler = pickle.load(f)
                 return True
         except:
             pass
@@ -80,32 +198,29 @@ class BusETAPredictor:
     def _save_model(self):
         """Save trained model"""
         os.makedirs(self.model_path, exist_ok=True)
-        with open(os.path.join(self.model_path, "eta_model.pkl"), 'wb') as f:
+        with open(os.path.join(self.model_path, ETA_MODEL_FILE), 'wb') as f:
             pickle.dump(self.eta_model, f)
-        with open(os.path.join(self.model_path, "eta_scaler.pkl"), 'wb') as f:
-            pickle.dump(self.scaler, f)
+    
+    def _load_csvs(self):
+        """Read the route CSVs once; training, patterns and live buses share them"""
+        route_stops_path = os.path.join(self.base_path, "route_stop_ordered.csv")
+        route_edges_path = os.path.join(self.base_path, "route_edges.csv")
+        
+        self._route_stops_df = pd.read_csv(route_stops_path, dtype=_ROUTE_STOPS_DTYPES)
+        self._route_edges_df = pd.read_csv(
+            route_edges_path, usecols=list(_EDGES_DTYPES), dtype=_EDGES_DTYPES
+        )
+        self._build_route_index(self._route_stops_df, self._route_edges_df)
     
     def _load_route_patterns(self):
         """Load route timing patterns from CSV data"""
         try:
-            route_stops_path = os.path.join(self.base_path, "route_stop_ordered.csv")
-            route_edges_path = os.path.join(self.base_path, "route_edges.csv")
-            
-            route_stops_df = pd.read_csv(route_stops_path)
-            route_edges_df = pd.read_csv(route_edges_path)
-            
             # Calculate average time between stops for each route
-            for route in route_stops_df['route_number'].unique():
-                route_data = route_stops_df[route_stops_df['route_number'] == route]
-                edges = route_edges_df[route_edges_df['route_number'] == route]
-                
-                total_distance = edges['distance_km'].sum()
-                num_stops = len(route_data)
-                
+            for route, stops in self._stops_by_route.items():
                 # Estimate timing patterns
-                self.route_timing_patterns[str(route)] = {
-                    'total_distance': total_distance,
-                    'num_stops': num_stops,
+                self.route_timing_patterns[route] = {
+                    'total_distance': self._edges_distance_by_route.get(route, 0.0),
+                    'num_stops': len(stops),
                     'avg_speed_peak': 12,  # km/h during peak
                     'avg_speed_normal': 18,  # km/h normal
                     'avg_speed_night': 25,  # km/h night
@@ -119,10 +234,35 @@ class BusETAPredictor:
         except Exception as e:
             print(f"   - Error loading patterns: {e}")
     
+    def _build_route_index(self, route_stops_df: pd.DataFrame, route_edges_df: pd.DataFrame):
+        """Group stops and edge lengths by route once, so per-route reads are dict lookups"""
+        ordered = route_stops_df.sort_values('stop_sequence', kind='stable')
+        self._stops_by_route = {
+            str(route): group.to_dict('records')
+            for route, group in ordered.groupby('route_number', sort=False)
+        }
+        self._edges_distance_by_route = {
+            str(route): distance
+            for route, distance in route_edges_df.groupby('route_number')['distance_km'].sum().items()
+        }
+        
+        # Every route's stop names and coordinates back to back, for the
+        # movement tick and position reads
+        self._route_stop_base = {}  # route -> offset of its first stop
+        stop_names, stop_lat, stop_lng = [], [], []
+        for route, stops in self._stops_by_route.items():
+            self._route_stop_base[route] = len(stop_lat)
+            stop_names.extend(stop.get('stop_name', 'Unknown') for stop in stops)
+            stop_lat.extend(float(stop.get('latitude', 0)) for stop in stops)
+            stop_lng.extend(float(stop.get('longitude', 0)) for stop in stops)
+        self._stop_names = np.array(stop_names, dtype=object)
+        self._stop_lat = np.array(stop_lat)
+        self._stop_lng = np.array(stop_lng)
+    
     def _train_eta_model(self):
         """Train ETA prediction model on simulated ticket timestamp data"""
         # Generate training data simulating 2 days of ticket machine data (reduced for speed)
-        print("   [ETA 1/4] Generating ticket training data...")
+        print("   [ETA 1/3] Generating ticket training data...")
         training_data = self._generate_ticket_training_data(days=2)
         
         features = [
@@ -138,186 +278,245 @@ class BusETAPredictor:
             'recent_delay',          # delay in last segment (minutes)
         ]
         
-        X = training_data[features]
-        y = training_data['actual_eta']  # in minutes
-        
-        # Scale features
-        print("   [ETA 2/4] Scaling features...")
-        X_scaled = self.scaler.fit_transform(X)
+        X = training_data[features].to_numpy()
+        y = training_data['actual_eta'].to_numpy()  # in minutes
         
-        # Train Gradient Boosting model (reduced for speed)
-        print("   [ETA 3/4] Training GradientBoosting model...")
-        self.eta_model = GradientBoostingRegressor(
-            n_estimators=50,
-            max_depth=5,
-            min_samples_split=5,
+        # Histogram gradient boosting bins each feature, so no scaling needed
+        print("   [ETA 2/3] Training HistGradientBoosting model...")
+        self.eta_model = HistGradientBoostingRegressor(
+            max_iter=150,
+            max_depth=8,
             learning_rate=0.1,
+            early_stopping=True,
+            validation_fraction=0.1,
+            n_iter_no_change=10,
             random_state=42
         )
-        self.eta_model.fit(X_scaled, y)
+        self.eta_model.fit(X, y)
         
         # Save model
-        print("   [ETA 4/4] Saving model...")
+        print("   [ETA 3/3] Saving model...")
         self._save_model()
         
         print(f"   - Trained on {len(training_data)} ticket records")
-        print(f"   - Model R² Score: {self.eta_model.score(X_scaled, y):.3f}")
+        print(f"   - Model R² Score: {self.eta_model.score(X, y):.3f}")
     
     def _generate_ticket_training_data(self, days: int = 10) -> pd.DataFrame:
         """
         Generate simulated ticket machine timestamp data
         In production, this would come from real ticket machines
-        """
-        records = []
         
-        # Load route data
-        route_stops_path = os.path.join(self.base_path, "route_stop_ordered.csv")
-        route_edges_path = os.path.join(self.base_path, "route_edges.csv")
-        
-        route_stops_df = pd.read_csv(route_stops_path)
-        route_edges_df = pd.read_csv(route_edges_path)
-        
-        routes = route_stops_df['route_number'].unique()
-        
-        for day in range(days):
-            for route in routes:
-                route_data = route_stops_df[route_stops_df['route_number'] == route].sort_values('stop_sequence')
-                stops = route_data.to_dict('records')
-                
-                if len(stops) < 3:
-                    continue
-                
-                # Simulate multiple bus trips per day (reduced for speed)
-                trips_per_day = random.randint(3, 5)
-                
-                for trip in range(trips_per_day):
-                    # Random start hour (5 AM to 11 PM)
-                    start_hour = random.randint(5, 22)
-                    start_minute = random.randint(0, 59)
-                    
-                    # Determine conditions
-                    is_peak = (7 <= start_hour <= 10) or (17 <= start_hour <= 20)
-                    is_weekend = day % 7 >= 5
-                    
-                    # Weather (random, with some patterns)
-                    weather_choices = ['clear'] * 7 + ['rain'] * 2 + ['heavy_rain'] * 1
-                    weather = random.choice(weather_choices)
-                    weather_factor = {'clear': 1.0, 'rain': 1.3, 'heavy_rain': 1.8}[weather]
-                    
-                    # Traffic based on time
-                    if is_peak:
-                        traffic_factor = random.uniform(1.4, 1.8)
-                    elif is_weekend:
-                        traffic_factor = random.uniform(0.9, 1.2)
-                    else:
-                        traffic_factor = random.uniform(1.0, 1.3)
-                    
-                    # Simulate bus movement through stops
-                    current_time = datetime.now().replace(
-                        hour=start_hour, minute=start_minute, second=0
-                    ) - timedelta(days=days-day)
-                    
-                    cumulative_delay = 0
-                    
-                    for i, stop in enumerate(stops[:-1]):
-                        # Get distance to next stop
-                        edges = route_edges_df[
-                            (route_edges_df['route_number'] == route) &
-                            (route_edges_df['from_stop'].astype(str) == str(stop['stop_id']))
-                        ]
-                        
-                        distance = edges['distance_km'].sum() if len(edges) > 0 else random.uniform(0.5, 2.0)
-                        
-                        # Calculate time to reach each future stop (reduced for speed)
-                        for j in range(i + 1, min(i + 3, len(stops))):
-                            target_stop = stops[j]
-                            stops_between = j - i
-                            
-                            # Calculate distance to target
-                            dist_to_target = distance * stops_between * random.uniform(0.8, 1.2)
-                            
-                            # Base speed
-                            if is_peak:
-                                base_speed = 12
-                            elif 22 <= start_hour or start_hour <= 5:
-                                base_speed = 25
-                            else:
-                                base_speed = 18
-                            
-                            # Calculate ETA
-                            travel_time = (dist_to_target / base_speed) * 60  # minutes
-                            stop_time = stops_between * 1.5  # 1.5 min per stop
-                            
-                            # Apply factors
-                            actual_eta = (travel_time + stop_time) * weather_factor * traffic_factor
-                            
-                            # Add some randomness
-                            actual_eta += random.gauss(0, 2)
-                            actual_eta = max(2, actual_eta)  # minimum 2 minutes
-                            
-                            # Historical average (simulated)
-                            historical_avg = (travel_time + stop_time) * 1.1
-                            
-                            records.append({
-                                'route_number': route,
-                                'current_stop_seq': i,
-                                'target_stop_seq': j,
-                                'distance_to_stop': dist_to_target,
-                                'num_stops_remaining': stops_between,
-                                'hour_of_day': start_hour,
-                                'day_of_week': day % 7,
-                                'is_peak_hour': 1 if is_peak else 0,
-                                'is_weekend': 1 if is_weekend else 0,
-                                'weather_factor': weather_factor,
-                                'traffic_factor': traffic_factor,
-                                'historical_avg_time': historical_avg,
-                                'recent_delay': cumulative_delay,
-                                'actual_eta': actual_eta
-                            })
-                        
-                        # Update cumulative delay
-                        cumulative_delay = random.gauss(cumulative_delay, 1)
-                        cumulative_delay = max(0, cumulative_delay)
+        Vectorized over every (trip, segment, target stop) row, so each kind
+        of random draw is one batch from self._rng
+        """
+        rng = self._rng
+        route_stops_df = self._route_stops_df
+        route_edges_df = self._route_edges_df
+        
+        # Stop rows grouped by route (first-appearance order), in sequence order
+        route_codes, routes = pd.factorize(route_stops_df['route_number'])
+        order = np.lexsort((route_stops_df['stop_sequence'].to_numpy(), route_codes))
+        route_codes = route_codes[order]
+        stop_ids = route_stops_df['stop_id'].astype(str).to_numpy()[order]
+        route_len = np.bincount(route_codes, minlength=len(routes))
+        
+        # Segments: every stop but the last on routes with 3+ stops, with the
+        # edge length out of it (NaN when no edge is recorded)
+        seg_count = np.where(route_len >= 3, route_len - 1, 0)
+        _, stop_pos = _expand(route_len)
+        is_seg = stop_pos < seg_count[route_codes]
+        edge_km = route_edges_df.groupby(
+            [route_edges_df['route_number'], route_edges_df['from_stop'].astype(str)]
+        )['distance_km'].sum()
+        seg_km = edge_km.reindex(pd.MultiIndex.from_arrays(
+            [routes[route_codes[is_seg]], stop_ids[is_seg]]
+        )).to_numpy()
+        seg_first = np.cumsum(seg_count) - seg_count
+        
+        # Trips: 3-5 per served route per day
+        served = np.flatnonzero(seg_count)
+        trips_per_slot = rng.integers(3, 6, size=days * len(served))
+        trip_day = np.repeat(np.repeat(np.arange(days), len(served)), trips_per_slot)
+        trip_route = np.repeat(np.tile(served, days), trips_per_slot)
+        n_trips = len(trip_route)
+        
+        # Conditions per trip: start hour 5 AM to 10 PM, weather, traffic
+        start_hour = rng.integers(5, 23, size=n_trips)
+        is_peak = ((7 <= start_hour) & (start_hour <= 10)) | ((17 <= start_hour) & (start_hour <= 20))
+        is_weekend = trip_day % 7 >= 5
+        weather_idx = rng.choice(
+            [_WEATHER_INDEX['clear'], _WEATHER_INDEX['rain'], _WEATHER_INDEX['heavy_rain']],
+            size=n_trips, p=[0.7, 0.2, 0.1]
+        )
+        weather_factor = WEATHER_FACTORS[weather_idx]
+        traffic_factor = rng.uniform(
+            np.where(is_peak, 1.4, np.where(is_weekend, 0.9, 1.0)),
+            np.where(is_peak, 1.8, np.where(is_weekend, 1.2, 1.3))
+        )
+        base_speed = np.where(
+            is_peak, 12, np.where((start_hour >= 22) | (start_hour <= 5), 25, 18)
+        )
         
-        return pd.DataFrame(records)
+        # One row per (trip, segment); unrecorded edges get a random length
+        leg_trip, leg_pos = _expand(seg_count[trip_route])
+        distance = seg_km[seg_first[trip_route[leg_trip]] + leg_pos]
+        missing = np.isnan(distance)
+        distance[missing] = rng.uniform(0.5, 2.0, size=missing.sum())
+        
+        # Cumulative delay follows c = max(0, c + N(0, 1)) along each trip,
+        # starting at 0; unrolled, that is the walk minus its running minimum
+        walk = rng.normal(0, 1, size=len(leg_trip))
+        walk[leg_pos == 0] = 0.0
+        walk = np.cumsum(walk)
+        walk -= walk[np.arange(len(walk)) - leg_pos]
+        recent_delay = walk - pd.Series(walk).groupby(leg_trip).cummin().to_numpy()
+        
+        # One row per (trip, segment, target) for the next 1-2 stops ahead
+        ahead = np.minimum(2, route_len[trip_route[leg_trip]] - 1 - leg_pos)
+        leg, target_offset = _expand(ahead)
+        trip = leg_trip[leg]
+        current_seq = leg_pos[leg]
+        stops_between = target_offset + 1
+        
+        dist_to_target = distance[leg] * stops_between * rng.uniform(0.8, 1.2, size=len(leg))
+        travel_time = (dist_to_target / base_speed[trip]) * 60  # minutes
+        stop_time = stops_between * 1.5  # 1.5 min per stop
+        actual_eta = (travel_time + stop_time) * weather_factor[trip] * traffic_factor[trip]
+        actual_eta = np.maximum(2, actual_eta + rng.normal(0, 2, size=len(leg)))  # minimum 2 minutes
+        
+        return pd.DataFrame({
+            'route_number': routes.to_numpy()[trip_route[trip]],
+            'current_stop_seq': current_seq,
+            'target_stop_seq': current_seq + stops_between,
+            'distance_to_stop': dist_to_target,
+            'num_stops_remaining': stops_between,
+            'hour_of_day': start_hour[trip],
+            'day_of_week': trip_day[trip] % 7,
+            'is_peak_hour': is_peak[trip].astype(int),
+            'is_weekend': is_weekend[trip].astype(int),
+            'weather_factor': weather_factor[trip],
+            'traffic_factor': traffic_factor[trip],
+            'historical_avg_time': (travel_time + stop_time) * 1.1,  # simulated
+            'recent_delay': recent_delay[leg],
+            'actual_eta': actual_eta
+        })
     
     def _initialize_live_buses(self):
         """Initialize simulated live bus positions"""
         # In production, this data comes from ticket machine API
-        route_stops_path = os.path.join(self.base_path, "route_stop_ordered.csv")
-        route_stops_df = pd.read_csv(route_stops_path)
-        
-        routes = route_stops_df['route_number'].unique()
-        
-        for route in routes:
-            route_data = route_stops_df[route_stops_df['route_number'] == route].sort_values('stop_sequence')
-            stops = route_data.to_dict('records')
-            
-            if len(stops) < 3:
-                continue
-            
-            destination_stop = stops[-1]['stop_name']
-            
-            # Create 2-3 buses per route
-            for bus_num in range(random.randint(2, 3)):
-                bus_id = f"{route}_BUS_{bus_num}"
-                current_stop_idx = random.randint(0, len(stops) - 2)
-                
-                self.live_bus_positions[bus_id] = {
-                    'route': str(route),
-                    'current_stop_idx': current_stop_idx,
-                    'current_stop': stops[current_stop_idx],
-                    'destination': destination_stop,
-                    'last_ticket_time': datetime.now() - timedelta(minutes=random.randint(1, 5)),
-                    'direction': 'forward',
-                    'delay_minutes': random.uniform(-2, 5),
-                    'passengers': random.randint(10, 50),
-                    'progress_to_next': 0.0,
-                    'current_lat': float(stops[current_stop_idx].get('latitude', 0)),
-                    'current_lng': float(stops[current_stop_idx].get('longitude', 0)),
-                }
-        
-        print(f"   - Initialized {len(self.live_bus_positions)} live buses on {len(routes)} routes")
+        routes = self._stops_by_route
+        served = [route for route, stops in routes.items() if len(stops) >= 3]
+        
+        # Create 2-3 buses per route, every random draw batched across buses
+        rng = self._rng
+        bus_route, bus_num = _expand(rng.integers(2, 4, size=len(served)))
+        last_stop = np.array([len(routes[route]) - 1 for route in served], dtype=np.int64)[bus_route]
+        start_idx = rng.integers(0, last_stop)  # any stop but the last
+        ticket_times = time.time() - 60 * rng.integers(1, 6, size=len(bus_route))
+        delays = rng.uniform(-2, 5, size=len(bus_route))
+        passengers = rng.integers(10, 51, size=len(bus_route))
+        
+        bus_routes = [served[r] for r in bus_route.tolist()]
+        bus_ids = [f"{route}_BUS_{num}" for route, num in zip(bus_routes, bus_num.tolist())]
+        self._build_position_table(bus_ids, bus_routes, start_idx, ticket_times, delays, passengers)
+        
+        print(f"   - Initialized {len(self._bus_rows)} live buses on {len(routes)} routes")
+    
+    def _build_position_table(self, bus_ids: List[str], bus_routes: List[str], stop_idx: np.ndarray,
+                              ticket_times: np.ndarray, delays: np.ndarray, passengers: np.ndarray):
+        """
+        Live bus state as parallel columns, one row per bus. These arrays are
+        the only copy of that state: ticket updates and the movement tick
+        write here and every read (positions, ETAs, listeners) slices them.
+        """
+        n = len(bus_ids)
+        self._bus_rows = {bus_id: i for i, bus_id in enumerate(bus_ids)}
+        self._bus_id_col = np.array(bus_ids, dtype=object)
+        self._route_col = np.array(bus_routes, dtype=object)
+        self._destination_col = np.array([self._stops_by_route[route][-1]['stop_name']
+                                          for route in bus_routes], dtype=object)
+        self._direction_col = np.full(n, 'forward', dtype=object)
+        self._ticket_time_col = np.asarray(ticket_times, dtype=np.float64)  # epoch seconds
+        self._updated_col = np.array([time.strftime('%H:%M:%S', time.localtime(t))
+                                      for t in self._ticket_time_col.tolist()], dtype=object)
+        self._delay_col = np.asarray(delays, dtype=np.float64)
+        self._passengers_col = np.asarray(passengers, dtype=np.int64)
+        
+        # Movement state, advanced in place by simulate_bus_movement
+        self._bus_stop_idx = np.asarray(stop_idx, dtype=np.int64)
+        self._bus_progress = np.zeros(n)
+        self._bus_stop_base = np.array([self._route_stop_base[route] for route in bus_routes],
+                                       dtype=np.int64)  # route offset into _stop_lat/_stop_lng
+        self._bus_last_stop = np.array([len(self._stops_by_route[route]) - 1 for route in bus_routes],
+                                       dtype=np.int64)  # index of the route's final stop
+        
+        # Buses start exactly on their current stop
+        here = self._bus_stop_base + self._bus_stop_idx
+        self._lat_col = self._stop_lat[here]
+        self._lng_col = self._stop_lng[here]
+    
+    def _position_rows(self, rows) -> List[Dict]:
+        """Client-facing bus positions for a slice or index array of the position table"""
+        status = DELAY_STATUS_LABELS[np.digitize(self._delay_col[rows], DELAY_STATUS_BINS)]
+        stops = self._stop_names[self._bus_stop_base[rows] + self._bus_stop_idx[rows]]
+        columns = zip(
+            self._bus_id_col[rows].tolist(), self._route_col[rows].tolist(),
+            stops.tolist(), self._destination_col[rows].tolist(),
+            self._direction_col[rows].tolist(), self._lat_col[rows].tolist(),
+            self._lng_col[rows].tolist(), self._updated_col[rows].tolist(),
+            status.tolist(), self._passengers_col[rows].tolist()
+        )
+        return [
+            {
+                'bus_id': bus_id,
+                'route': route,
+                'current_stop': stop,
+                'destination': destination,
+                'direction': direction,
+                'latitude': lat,
+                'longitude': lng,
+                'last_update': updated,
+                'delay_status': delay_status,
+                'passengers': passengers
+            }
+            for (bus_id, route, stop, destination, direction,
+                 lat, lng, updated, delay_status, passengers) in columns
+        ]
+    
+    def get_live_positions(self) -> List[Dict]:
+        """Client-facing position of every tracked bus"""
+        return self._position_rows(slice(None))
+    
+    def get_live_position(self, bus_id: str) -> Optional[Dict]:
+        """Client-facing position of a single bus"""
+        i = self._bus_rows.get(bus_id)
+        if i is None:
+            return None
+        return self._position_rows(slice(i, i + 1))[0]
+    
+    def add_position_listener(self, callback):
+        """Register a callback(bus_id, position) fired on every position update"""
+        self._position_listeners.append(callback)
+    
+    def remove_position_listener(self, callback):
+        """Unregister a position update callback"""
+        if callback in self._position_listeners:
+            self._position_listeners.remove(callback)
+    
+    def _notify_positions(self, rows: np.ndarray):
+        """
+        Push the client-facing positions of the buses in rows to all listeners,
+        each position built once and shared by every listener
+        """
+        if not self._position_listeners:
+            return
+        listeners = list(self._position_listeners)
+        for position in self._position_rows(rows):
+            for callback in listeners:
+                try:
+                    callback(position['bus_id'], position)
+                except Exception as e:
+                    print(f"   - Position listener error: {e}")
     
     def update_bus_position(self, bus_id: str, stop_id: str, timestamp: datetime, 
                            ticket_count: int = 0):
@@ -325,24 +524,28 @@ class BusETAPredictor:
         Update bus position from ticket machine data
         Called when conductor generates a ticket
         """
-        if bus_id in self.live_bus_positions:
-            bus = self.live_bus_positions[bus_id]
-            
-            # Calculate delay based on expected vs actual time
-            expected_time = bus['last_ticket_time'] + timedelta(minutes=3)
-            actual_delay = (timestamp - expected_time).total_seconds() / 60
+        i = self._bus_rows.get(bus_id)
+        if i is not None:
+            # Calculate delay based on expected vs actual time, in epoch
+            # seconds rather than datetime arithmetic
+            ticket_time = timestamp.timestamp()
+            expected_time = float(self._ticket_time_col[i]) + 180  # 3 minutes
+            actual_delay = (ticket_time - expected_time) / 60
             
-            bus['last_ticket_time'] = timestamp
-            bus['delay_minutes'] = (bus['delay_minutes'] + actual_delay) / 2  # Running average
-            bus['passengers'] += ticket_count
+            self._ticket_time_col[i] = ticket_time
+            self._updated_col[i] = timestamp.strftime('%H:%M:%S')
+            self._delay_col[i] = (self._delay_col[i] + actual_delay) / 2  # Running average
+            self._passengers_col[i] += ticket_count
             
             # Store in history for model retraining
-            self.ticket_history.append({
-                'bus_id': bus_id,
-                'stop_id': stop_id,
-                'timestamp': timestamp,
-                'delay': actual_delay
-            })
+            h = self._hist_pos % TICKET_HISTORY_SIZE
+            self._hist_bus_id[h] = bus_id
+            self._hist_stop_id[h] = stop_id
+            self._hist_ts[h] = timestamp
+            self._hist_delay[h] = actual_delay
+            self._hist_pos += 1
+            
+            self._notify_positions(np.array([i]))
     
     def predict_eta(self, route_number: str, target_stop_name: str, 
                    user_stop_name: str, data_loader) -> Dict:
@@ -352,106 +555,23 @@ class BusETAPredictor:
         if not self._ready:
             return {'error': 'ETA Predictor not ready', 'incoming_buses': []}
         
-        incoming_buses = []
         current_time = datetime.now()
-        hour = current_time.hour
-        day_of_week = current_time.weekday()
-        
-        # Determine current conditions
-        is_peak = (7 <= hour <= 10) or (17 <= hour <= 20)
-        is_weekend = day_of_week >= 5
-        weather_factor = self._get_weather_factor()
-        traffic_factor = self._get_traffic_factor(hour, is_weekend)
         
         # Get all stops for this route to find user's position
         route_stops = data_loader.get_route_stops(str(route_number))
         if not route_stops:
             return {'error': f'Route {route_number} not found', 'incoming_buses': []}
         
-        # Find user's stop index in route stops using best fuzzy matching
-        user_stop_idx = None
-        user_stop_lower = user_stop_name.lower().strip()
-        best_match_len = -1
-        
-        for idx, stop in enumerate(route_stops):
-            sn = stop['stop_name'].lower()
-            # Exact match is best
-            if sn == user_stop_lower:
-                user_stop_idx = idx
-                break
-            # Otherwise find the longest matching stop name (most specific)
-            if user_stop_lower in sn or sn in user_stop_lower:
-                match_len = len(sn)
-                if match_len > best_match_len:
-                    best_match_len = match_len
-                    user_stop_idx = idx
-        
+        user_stop_idx = self._match_user_stop(str(route_number), route_stops, user_stop_name, data_loader)
         if user_stop_idx is None:
             return {'error': f'Stop {user_stop_name} not found on route {route_number}', 'incoming_buses': []}
         
         print(f"   🔍 ETA: user_stop='{user_stop_name}' matched idx={user_stop_idx} on route {route_number}")
         
-        # Find buses on this route that haven't passed user's stop
-        route_str = str(route_number)
-        for bus_id, bus_info in self.live_bus_positions.items():
-            bus_route = str(bus_info['route'])
-            if bus_route != route_str:
-                continue
-            
-            bus_stop_idx = bus_info['current_stop_idx']
-            print(f"   🚌 Bus {bus_id}: stop_idx={bus_stop_idx}, user_idx={user_stop_idx}")
-            
-            # Check if bus is before user's stop (coming towards them)
-            if bus_stop_idx < user_stop_idx:
-                stops_away = user_stop_idx - bus_stop_idx
-                
-                # Estimate distance
-                distance = stops_away * 1.2  # Rough estimate: 1.2 km per stop
-                
-                # Get historical average for this segment
-                historical_avg = stops_away * 3  # 3 min per stop average
-                
-                # Prepare features for prediction
-                features = np.array([[
-                    distance,
-                    stops_away,
-                    hour,
-                    day_of_week,
-                    1 if is_peak else 0,
-                    1 if is_weekend else 0,
-                    weather_factor,
-                    traffic_factor,
-                    historical_avg,
-                    bus_info['delay_minutes']
-                ]])
-                
-                # Predict ETA
-                try:
-                    features_scaled = self.scaler.transform(features)
-                    predicted_eta = self.eta_model.predict(features_scaled)[0]
-                except:
-                    # Fallback calculation
-                    predicted_eta = historical_avg * traffic_factor * weather_factor
-                
-                # Apply current delay
-                predicted_eta += bus_info['delay_minutes']
-                predicted_eta = max(1, predicted_eta)  # Minimum 1 minute
-                
-                # Calculate arrival time
-                arrival_time = current_time + timedelta(minutes=predicted_eta)
-                
-                incoming_buses.append({
-                    'bus_id': bus_id,
-                    'route_number': route_str,
-                    'current_location': bus_info['current_stop'].get('stop_name', f"Stop {bus_stop_idx}"),
-                    'stops_away': stops_away,
-                    'distance_km': round(distance, 1),
-                    'eta_minutes': round(predicted_eta, 1),
-                    'arrival_time': arrival_time.strftime('%H:%M'),
-                    'delay_status': self._get_delay_status(bus_info['delay_minutes']),
-                    'passengers': bus_info['passengers'],
-                    'confidence': self._calculate_confidence(stops_away, bus_info['delay_minutes'])
-                })
+        rows = self._buses_before(str(route_number), user_stop_idx)
+        incoming_buses = self._score_incoming(
+            rows, np.full(len(rows), user_stop_idx), current_time
+        )
         
         # Sort by ETA
         incoming_buses.sort(key=lambda x: x['eta_minutes'])
@@ -467,17 +587,152 @@ class BusETAPredictor:
             'next_bus_eta': incoming_buses[0]['eta_minutes'] if incoming_buses else None
         }
     
+    def _route_stop_positions(self, route: str, route_stops: List[Dict], data_loader) -> Dict[str, int]:
+        """First index of each exact stop name on a route, built once per data load"""
+        version = getattr(data_loader, 'cache_version', None)
+        if version != self._stop_positions_version:
+            self._stop_positions = {}
+            self._stop_positions_version = version
+        
+        positions = self._stop_positions.get(route)
+        if positions is None:
+            positions = {}
+            for idx, stop in enumerate(route_stops):
+                positions.setdefault(stop['stop_name_lower'], idx)
+            self._stop_positions[route] = positions
+        return positions
+    
+    def _match_user_stop(self, route: str, route_stops: List[Dict], user_stop_name: str,
+                         data_loader) -> Optional[int]:
+        """Find user's stop index in route stops using best fuzzy matching"""
+        user_stop_lower = user_stop_name.lower().strip()
+        
+        # Exact match is best, and the usual case: names come from the stop list
+        exact = self._route_stop_positions(route, route_stops, data_loader).get(user_stop_lower)
+        if exact is not None:
+            return exact
+        
+        user_stop_idx = None
+        best_match_len = -1
+        
+        for idx, stop in enumerate(route_stops):
+            sn = stop['stop_name_lower']
+            # Otherwise find the longest matching stop name (most specific)
+            if user_stop_lower in sn or sn in user_stop_lower:
+                match_len = len(sn)
+                if match_len > best_match_len:
+                    best_match_len = match_len
+                    user_stop_idx = idx
+        
+        return user_stop_idx
+    
+    def _buses_before(self, route: str, user_stop_idx: int) -> np.ndarray:
+        """
+        Rows of buses on a route that haven't passed user's stop, i.e. are
+        coming towards them
+        """
+        return np.flatnonzero((self._route_col == route) & (self._bus_stop_idx < user_stop_idx))
+    
+    def _score_incoming(self, rows: np.ndarray, user_stop_idx: np.ndarray,
+                        current_time: datetime) -> List[Dict]:
+        """
+        ETA rows for the buses in rows heading to the matching user_stop_idx,
+        scored with one model call for the whole batch
+        """
+        if len(rows) == 0:
+            return []
+        
+        hour = current_time.hour
+        day_of_week = current_time.weekday()
+        
+        # Determine current conditions
+        is_peak = (7 <= hour <= 10) or (17 <= hour <= 20)
+        is_weekend = day_of_week >= 5
+        weather_factor = self._get_weather_factor()
+        traffic_factor = self._get_traffic_factor(hour, is_weekend)
+        
+        current_idx = self._bus_stop_idx[rows]
+        stops_away = user_stop_idx - current_idx
+        delays = self._delay_col[rows]
+        distance = stops_away * 1.2  # Rough estimate: 1.2 km per stop
+        historical_avg = stops_away * 3.0  # 3 min per stop average
+        
+        # Prepare features for prediction, one row per bus
+        features = np.empty((len(rows), 10))
+        features[:, 0] = distance
+        features[:, 1] = stops_away
+        features[:, 2] = hour
+        features[:, 3] = day_of_week
+        features[:, 4] = 1 if is_peak else 0
+        features[:, 5] = 1 if is_weekend else 0
+        features[:, 6] = weather_factor
+        features[:, 7] = traffic_factor
+        features[:, 8] = historical_avg
+        features[:, 9] = delays
+        
+        # Predict ETA; the model takes float64 as-is (narrower input would only
+        # be cast back) and handles NaN itself, so input validation is skipped
+        try:
+            with config_context(assume_finite=True):
+                predicted = self.eta_model.predict(features)
+        except:
+            # Fallback calculation
+            predicted = historical_avg * traffic_factor * weather_factor
+        
+        # Apply current delay
+        predicted = np.maximum(1, predicted + delays)  # Minimum 1 minute
+        
+        locations = self._stop_names[self._bus_stop_base[rows] + current_idx]
+        return [
+            {
+                'bus_id': bus_id,
+                'route_number': route,
+                'current_location': location,
+                'stops_away': away,
+                'distance_km': round(km, 1),
+                'eta_minutes': round(eta, 1),
+                'arrival_time': (current_time + timedelta(minutes=eta)).strftime('%H:%M'),
+                'delay_status': self._get_delay_status(delay),
+                'passengers': riders,
+                'confidence': self._calculate_confidence(away, delay)
+            }
+            for bus_id, route, location, away, km, eta, delay, riders in zip(
+                self._bus_id_col[rows].tolist(), self._route_col[rows].tolist(),
+                locations.tolist(), stops_away.tolist(), distance.tolist(), predicted.tolist(),
+                delays.tolist(), self._passengers_col[rows].tolist()
+            )
+        ]
+    
     def get_all_incoming_buses(self, user_stop_name: str, data_loader) -> Dict:
         """Get all incoming buses to a stop across all routes"""
-        all_buses = []
-        
         # Get all routes passing through this stop
-        routes = data_loader.get_routes_for_stop(user_stop_name)
+        routes = data_loader.get_routes_for_stop(user_stop_name) if self._ready else ()
         
+        # Collect approaching buses from every route, then score them together
+        rows, user_idx = [], []
         for route in routes:
-            result = self.predict_eta(route, user_stop_name, user_stop_name, data_loader)
-            if 'incoming_buses' in result:
-                all_buses.extend(result['incoming_buses'])
+            route_stops = data_loader.get_route_stops(str(route))
+            if not route_stops:
+                continue
+            user_stop_idx = self._match_user_stop(str(route), route_stops, user_stop_name, data_loader)
+            if user_stop_idx is not None:
+                route_rows = self._buses_before(str(route), user_stop_idx)
+                rows.append(route_rows)
+                user_idx.append(np.full(len(route_rows), user_stop_idx))
+        
+        by_route = defaultdict(list)
+        if rows:
+            incoming = self._score_incoming(np.concatenate(rows), np.concatenate(user_idx), datetime.now())
+        else:
+            incoming = []
+        for bus in incoming:
+            by_route[bus['route_number']].append(bus)
+        
+        # Each route contributes its 5 nearest buses, as predict_eta reports
+        all_buses = []
+        for route_buses in by_route.values():
+            route_buses.sort(key=lambda x: x['eta_minutes'])
+            all_buses.extend(route_buses[:5])
         
         # Sort all by ETA
         all_buses.sort(key=lambda x: x['eta_minutes'])
@@ -491,28 +746,11 @@ class BusETAPredictor:
     
     def _get_weather_factor(self) -> float:
         """Get current weather impact factor"""
-        factors = {
-            'clear': 1.0,
-            'cloudy': 1.05,
-            'rain': 1.3,
-            'heavy_rain': 1.8
-        }
-        return factors.get(self.current_weather, 1.0)
+        return float(WEATHER_FACTORS[self._weather_idx])
     
     def _get_traffic_factor(self, hour: int, is_weekend: bool) -> float:
         """Get traffic factor based on time"""
-        if is_weekend:
-            return 1.1
-        
-        if 7 <= hour <= 10:
-            return 1.6  # Morning rush
-        elif 17 <= hour <= 20:
-            return 1.8  # Evening rush (worst)
-        elif 11 <= hour <= 16:
-            return 1.2  # Midday
-        elif 21 <= hour or hour <= 6:
-            return 0.9  # Night
-        return 1.0
+        return float(TRAFFIC_FACTORS[int(is_weekend), hour])
     
     def _get_delay_status(self, delay_minutes: float) -> str:
         """Get human-readable delay status"""
@@ -539,8 +777,9 @@ class BusETAPredictor:
     
     def set_weather(self, weather: str):
         """Update current weather condition"""
-        if weather in ['clear', 'cloudy', 'rain', 'heavy_rain']:
+        if weather in _WEATHER_INDEX:
             self.current_weather = weather
+            self._weather_idx = _WEATHER_INDEX[weather]
     
     def set_traffic(self, traffic: str):
         """Update current traffic condition"""
@@ -548,44 +787,36 @@ class BusETAPredictor:
             self.current_traffic = traffic
     
     def simulate_bus_movement(self):
-        """Simulate smooth bus movement between stops for realistic demo tracking"""
-        if not hasattr(self, '_cached_route_stops'):
-            route_stops_path = os.path.join(self.base_path, "route_stop_ordered.csv")
-            self._cached_route_stops = pd.read_csv(route_stops_path)
-            
-        for bus_id, bus_info in self.live_bus_positions.items():
-            route_data = self._cached_route_stops[
-                self._cached_route_stops['route_number'] == bus_info['route']
-            ].sort_values('stop_sequence')
-            stops = route_data.to_dict('records')
-            
-            idx = bus_info['current_stop_idx']
-            if idx < len(stops) - 1:
-                curr_stop = stops[idx]
-                next_stop = stops[idx + 1]
-                
-                # Advance progress by ~2% per 3-second tick, creating a smooth ~2.5 minute journey between stops
-                bus_info['progress_to_next'] = bus_info.get('progress_to_next', 0.0) + 0.02
-                
-                if bus_info['progress_to_next'] >= 1.0:
-                    # Reached next stop
-                    bus_info['current_stop_idx'] += 1
-                    bus_info['progress_to_next'] = 0.0
-                    bus_info['current_stop'] = next_stop
-                    bus_info['last_ticket_time'] = datetime.now()
-                    bus_info['current_lat'] = float(next_stop.get('latitude', 0))
-                    bus_info['current_lng'] = float(next_stop.get('longitude', 0))
-                    
-                    bus_info['delay_minutes'] += random.gauss(0, 1)
-                    bus_info['passengers'] += random.randint(-5, 10)
-                    bus_info['passengers'] = max(0, bus_info['passengers'])
-                else:
-                    # Simple linear interpolation between stops (fast, no external API)
-                    lat1, lon1 = float(curr_stop.get('latitude', 0)), float(curr_stop.get('longitude', 0))
-                    lat2, lon2 = float(next_stop.get('latitude', 0)), float(next_stop.get('longitude', 0))
-                    p = bus_info['progress_to_next']
-                    bus_info['current_lat'] = lat1 + (lat2 - lat1) * p
-                    bus_info['current_lng'] = lon1 + (lon2 - lon1) * p
+        """
+        Simulate smooth bus movement between stops for realistic demo tracking
+        The tick is one kernel over every bus at once; the loop afterwards
+        only notifies listeners
+        """
+        stop_idx = self._bus_stop_idx
+        progress = self._bus_progress
+        moving = np.empty(len(stop_idx), dtype=bool)
+        arrived = np.empty(len(stop_idx), dtype=bool)
+        
+        # Advance progress by ~2% per 3-second tick, creating a smooth ~2.5 minute journey between stops
+        # Simple linear interpolation between stops (fast, no external API)
+        _advance_buses(
+            stop_idx, progress, self._bus_last_stop, self._bus_stop_base,
+            self._stop_lat, self._stop_lng, self._lat_col, self._lng_col, 0.02,
+            moving, arrived
+        )
+        
+        # Reached next stop
+        n_arrived = int(np.count_nonzero(arrived))
+        self._delay_col[arrived] += self._rng.normal(0, 1, n_arrived)
+        self._passengers_col[arrived] = np.maximum(
+            0, self._passengers_col[arrived] + self._rng.integers(-5, 11, n_arrived)
+        )
+        
+        now = time.time()
+        self._ticket_time_col[arrived] = now
+        self._updated_col[arrived] = time.strftime('%H:%M:%S', time.localtime(now))
+        
+        self._notify_positions(np.flatnonzero(moving))
                         
     def _get_osrm_path(self, lat1: float, lon1: float, lat2: float, lon2: float) -> List[List[float]]:
         """Fetch and cache precise road geometry between two points using OSRM"""
@@ -612,15 +843,30 @@ class BusETAPredictor:
         path = [[lat1, lon1], [lat2, lon2]]
         self._osrm_cache[key] = path
         return path
+    
+    def ticket_history(self) -> pd.DataFrame:
+        """Recorded tickets, oldest first, as one frame built from the ring buffer"""
+        order = np.arange(min(self._hist_pos, TICKET_HISTORY_SIZE))
+        if self._hist_pos > TICKET_HISTORY_SIZE:
+            # Wrapped: the oldest ticket sits at the next write position
+            order = np.roll(order, -(self._hist_pos % TICKET_HISTORY_SIZE))
+        return pd.DataFrame({
+            'bus_id': self._hist_bus_id[order],
+            'stop_id': self._hist_stop_id[order],
+            'timestamp': self._hist_ts[order],
+            'delay': self._hist_delay[order]
+        })
+    
     def retrain_model(self):
         """Retrain model with accumulated ticket history"""
-        if len(self.ticket_history) < 100:
-            return {'status': 'Not enough data', 'records': len(self.ticket_history)}
+        records = min(self._hist_pos, TICKET_HISTORY_SIZE)
+        if records < 100:
+            return {'status': 'Not enough data', 'records': records}
         
         # In production, combine historical + new data
         print("⏳ Retraining ETA model with new data...")
         self._train_eta_model()
-        return {'status': 'Model retrained', 'records': len(self.ticket_history)}
+        return {'status': 'Model retrained', 'records': records}
     
     def is_ready(self) -> bool:
         return self._ready
@@ -6,6 +6,8 @@ from typing import List, Dict, Optional
 from collections import defaultdict
 import heapq
 
+from .data_loader import normalize_stop_name
+
 class RouteEngine:
     def __init__(self, data_loader):
         self.data_loader = data_loader
@@ -14,13 +16,8 @@ class RouteEngine:
     
     def _normalize_stop_name(self, name: str) -> str:
         """Strip coordinate suffixes and route tags for better matching"""
-        import re
-        name = name.lower().strip()
-        # Remove patterns like (12.9910N), (Route M1), #2, etc.
-        name = re.sub(r'\s*\([\d.]+n\)', '', name)
-        name = re.sub(r'\s*\(route\s+\w+\)', '', name)
-        name = re.sub(r'\s*#\d+', '', name)
-        return name.strip()
+        # Shared precompiled patterns, memoized per distinct name
+        return normalize_stop_name(name)
     
     def _stops_match(self, query: str, stop_name: str) -> bool:
         """Check if query matches a stop name using normalized comparison"""
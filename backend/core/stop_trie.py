@@ -0,0 +1,73 @@
+"""
+Stop Name Trie - Prefix index for autocomplete lookups
+"""
+
+from collections import deque
+from typing import Hashable, List
+
+
+class _TrieNode:
+    __slots__ = ('children', 'payloads')
+
+    def __init__(self):
+        self.children = {}
+        self.payloads = []
+
+
+class StopTrie:
+    """Prefix tree over lowercase stop names, built once at startup"""
+
+    def __init__(self):
+        self._root = _TrieNode()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def insert(self, key: str, payload: Hashable):
+        """Insert a lowercase key and attach a payload to its terminal node"""
+        node = self._root
+        for ch in key:
+            child = node.children.get(ch)
+            if child is None:
+                child = _TrieNode()
+                node.children[ch] = child
+            node = child
+        if payload not in node.payloads:
+            node.payloads.append(payload)
+            self._size += 1
+
+    def insert_words(self, name: str, payload: Hashable):
+        """
+        Insert every word-suffix of a name so queries also match from the
+        start of any word, e.g. 'nagar' finds 'anna nagar west'
+        """
+        words = name.split()
+        for i in range(len(words)):
+            self.insert(' '.join(words[i:]), payload)
+
+    def starts_with(self, prefix: str, limit: int = 10) -> List[Hashable]:
+        """
+        Return up to `limit` distinct payloads whose key starts with prefix,
+        shortest completions first
+        """
+        node = self._root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+
+        results = []
+        seen = set()
+        queue = deque([node])
+        while queue and len(results) < limit:
+            node = queue.popleft()
+            for payload in node.payloads:
+                if payload not in seen:
+                    seen.add(payload)
+                    results.append(payload)
+                    if len(results) >= limit:
+                        break
+            queue.extend(node.children.values())
+
+        return results
@@ -0,0 +1,110 @@
+"""
+Substring Matcher - Aho-Corasick automaton for partial stop name lookups
+"""
+
+from bisect import bisect_right
+from collections import deque
+from typing import List, Optional, Set
+
+# Never appears in a stop name, keeps joined keys from matching across boundaries
+_SEPARATOR = '\x00'
+
+
+class SubstringMatcher:
+    """
+    Answers "which keys contain the query, or are contained in it" without
+    testing every key. Keys inside the query come from an Aho-Corasick pass
+    over the query; keys containing the query come from str.find over all
+    keys joined into one string. Built once at load time, read-only after.
+    """
+
+    def __init__(self, keys):
+        self._keys = list(dict.fromkeys(keys))
+        self._rank = {key: i for i, key in enumerate(self._keys)}
+
+        # Key start offsets in the joined string, for mapping find() hits back
+        self._joined = _SEPARATOR.join(self._keys)
+        self._offsets = []
+        offset = 0
+        for key in self._keys:
+            self._offsets.append(offset)
+            offset += len(key) + 1
+
+        self._build_automaton()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _build_automaton(self):
+        """Goto/fail/output tables over all keys"""
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        for rank, key in enumerate(self._keys):
+            state = 0
+            for ch in key:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(rank)
+
+        # Breadth-first so every fail target is finished before it is used
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def _ranks_in(self, text: str) -> Set[int]:
+        """Ranks of keys occurring inside text, in O(len(text) + matches)"""
+        found = set(self._out[0])  # Empty key
+        state = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+    def _ranks_containing(self, text: str) -> Set[int]:
+        """Ranks of keys that contain text"""
+        if not text:
+            return set(range(len(self._keys)))
+        found = set()
+        if _SEPARATOR in text:
+            return found
+        pos = self._joined.find(text)
+        while pos != -1:
+            rank = bisect_right(self._offsets, pos) - 1
+            found.add(rank)
+            # Resume at the next key, every hit in this one is the same answer
+            pos = self._joined.find(text, self._offsets[rank] + len(self._keys[rank]) + 1)
+        return found
+
+    def containing(self, text: str) -> List[str]:
+        """All keys k with `text in k`, in insertion order"""
+        return [self._keys[rank] for rank in sorted(self._ranks_containing(text))]
+
+    def related(self, text: str) -> Set[str]:
+        """All keys k with `text in k or k in text`"""
+        ranks = self._ranks_in(text) | self._ranks_containing(text)
+        return {self._keys[rank] for rank in ranks}
+
+    def first_related(self, text: str) -> Optional[str]:
+        """Earliest-added key k with `text in k or k in text`, or None"""
+        ranks = self._ranks_in(text) | self._ranks_containing(text)
+        return self._keys[min(ranks)] if ranks else None
@@ -3,6 +3,7 @@ Test suite for Chennai MTC Smart Transport API
 """
 
 import pytest
+import asyncio
 import sys
 import os
 
@@ -10,6 +11,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from fastapi.testclient import TestClient
+import app as app_module
 from app import app
 
 client = TestClient(app)
@@ -69,12 +71,61 @@ class TestStopsEndpoints:
         assert "suggestions" in data
         assert isinstance(data["suggestions"], list)
     
+    def test_all_stops_with_routes(self):
+        """Test the precomputed all-stops payload is unique and sorted"""
+        response = client.get("/get-all-stops-with-routes")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == len(data["stops"])
+        names = [s["stop_name"].lower() for s in data["stops"]]
+        assert len(names) == len(set(names))
+        counts = [len(s["routes"]) for s in data["stops"]]
+        assert counts == sorted(counts, reverse=True)
+    
+    def test_large_payloads_are_compressed(self):
+        """Test gzip and cache headers on the static stops payload"""
+        response = client.get(
+            "/get-all-stops-with-routes",
+            headers={"Accept-Encoding": "gzip"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert "max-age" in response.headers["cache-control"]
+    
+    def test_stop_suggestions_match_query(self):
+        """Test suggestions contain the query and respect the limit"""
+        response = client.get("/get-stop-suggestions?query=nagar&limit=5")
+        assert response.status_code == 200
+        suggestions = response.json()["suggestions"]
+        assert 0 < len(suggestions) <= 5
+        for s in suggestions:
+            assert "nagar" in s["stop_name"].lower()
+    
     def test_stop_suggestions_min_length(self):
         """Test that suggestions require minimum query length"""
         response = client.get("/get-stop-suggestions?query=a")
         assert response.status_code == 422  # Validation error
 
 
+    def test_destination_stops_are_unique(self):
+        """Test destinations are deduplicated across routes"""
+        response = client.get("/get-destination-stops?from_stop=Inner Ring Road")
+        assert response.status_code == 200
+        data = response.json()
+        names = [s["stop_name"].lower() for s in data["destination_stops"]]
+        assert len(names) == len(set(names))
+        assert data["total_destinations"] == len(names)
+    
+    def test_reachable_stops(self):
+        """Test reachable stops are deduplicated and respect the limit"""
+        response = client.get("/get-reachable-stops?from_stop=Inner Ring Road&limit=5")
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["reachable_stops"]) <= 5
+        names = [s["stop_name"].lower() for s in data["reachable_stops"]]
+        assert len(names) == len(set(names))
+
+
 class TestRouteEndpoints:
     """Test route-related endpoints"""
     
@@ -154,5 +205,134 @@ class TestPredictionEndpoints:
         assert offpeak_data["peak_hour"] == False
 
 
+    def test_bus_eta_without_route(self):
+        """Test ETA lookup across all routes serving both stops"""
+        response = client.post("/get-bus-eta", json={
+            "from_stop": "Jawaharlal Nehru Road",
+            "to_stop": "Inner Ring Road"
+        })
+        assert response.status_code == 200
+        data = response.json()
+        assert "incoming_buses" in data
+        etas = [bus["eta_minutes"] for bus in data["incoming_buses"]]
+        assert etas == sorted(etas)
+    
+    def test_bus_eta_respects_direction(self):
+        """Test routes running from to_stop towards from_stop are not used"""
+        # Last and first stop of route 11%20%G, i.e. against its direction
+        response = client.post("/get-bus-eta", json={
+            "from_stop": "Pallavan Salai, Zone 5 Royapuram",
+            "to_stop": "Ashok Pillar Road, Zone 10 Kodambakkam"
+        })
+        assert response.status_code == 200
+        routes = {bus["route_number"] for bus in response.json()["incoming_buses"]}
+        assert "11%20%G" not in routes
+
+
+class TestLiveBusEndpoints:
+    """Test real-time bus tracking endpoints"""
+    
+    def test_live_bus_positions(self):
+        """Test live positions carry formatted timestamps"""
+        client.post("/simulate-bus-movement")
+        response = client.get("/live-bus-positions")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_buses"] == len(data["buses"])
+        assert len(data["timestamp"]) == 8
+        for bus in data["buses"]:
+            assert len(bus["last_update"]) == 8
+    
+    def test_update_bus_position(self):
+        """Test ticket updates refresh the bus timestamp"""
+        bus_id = client.get("/live-bus-positions").json()["buses"][0]["bus_id"]
+        response = client.post(
+            "/update-bus-position",
+            params={"bus_id": bus_id, "stop_id": "1", "ticket_count": 2}
+        )
+        assert response.status_code == 200
+        assert response.json()["bus_id"] == bus_id
+    
+    def test_update_bus_position_is_visible(self):
+        """Test ticket updates show up in live positions"""
+        before = client.get("/live-bus-positions").json()["buses"][0]
+        client.post(
+            "/update-bus-position",
+            params={"bus_id": before["bus_id"], "stop_id": "1", "ticket_count": 3}
+        )
+        buses = client.get("/live-bus-positions").json()["buses"]
+        after = next(bus for bus in buses if bus["bus_id"] == before["bus_id"])
+        assert after["passengers"] == before["passengers"] + 3
+    
+    def test_stream_fans_out_one_frame(self):
+        """Test a position update reaches every stream client as the same bytes"""
+        bus_id = client.get("/live-bus-positions").json()["buses"][0]["bus_id"]
+        
+        async def run():
+            first, second = asyncio.Queue(), asyncio.Queue()
+            app_module._sse_loop = asyncio.get_running_loop()
+            app_module._sse_queues.update((first, second))
+            app_module.eta_predictor.add_position_listener(app_module._broadcast_position)
+            try:
+                # Ticket updates arrive on a worker thread, not the loop
+                await asyncio.to_thread(
+                    client.post, "/update-bus-position",
+                    params={"bus_id": bus_id, "stop_id": "1", "ticket_count": 1}
+                )
+                return await asyncio.wait_for(asyncio.gather(first.get(), second.get()), 5)
+            finally:
+                app_module._sse_queues.difference_update((first, second))
+                app_module.eta_predictor.remove_position_listener(app_module._broadcast_position)
+        
+        first_frame, second_frame = asyncio.run(run())
+        assert first_frame == second_frame
+        assert first_frame.startswith(b"event: position\n")
+        assert bus_id.encode() in first_frame
+    
+    def test_stream_listener_removed_after_last_client(self):
+        """Test the shared position listener lives only while clients are connected"""
+        class GoneRequest:
+            async def is_disconnected(self):
+                return True
+        
+        listeners = app_module.eta_predictor._position_listeners
+        
+        async def run():
+            streams = [
+                (await app_module.stream_live_bus_positions(GoneRequest())).body_iterator
+                for _ in range(2)
+            ]
+            for stream in streams:
+                assert (await stream.__anext__()).startswith(b"event: snapshot\n")
+            assert listeners.count(app_module._broadcast_position) == 1
+            
+            async for _ in streams[0]:
+                pass
+            assert listeners.count(app_module._broadcast_position) == 1
+            
+            async for _ in streams[1]:
+                pass
+            assert app_module._broadcast_position not in listeners
+            assert not app_module._sse_queues
+        
+        asyncio.run(run())
+    
+    def test_stream_full_queue_drops_frames(self):
+        """Test a slow client drops new frames instead of raising"""
+        async def run():
+            full, ready = asyncio.Queue(maxsize=1), asyncio.Queue(maxsize=1)
+            full.put_nowait(b"old")
+            app_module._sse_queues.update((full, ready))
+            try:
+                app_module._offer_frame(b"new")
+            finally:
+                app_module._sse_queues.difference_update((full, ready))
+            return full, ready
+        
+        full, ready = asyncio.run(run())
+        assert full.qsize() == 1 and full.get_nowait() == b"old"
+        assert ready.get_nowait() == b"new"
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])